@@ -0,0 +1,162 @@
+# ---------------------------------------------------------------------------- #
+# IMPORT PACKAGES
+# ---------------------------------------------------------------------------- #
+
+import numpy as np
+from scipy.cluster.vq import kmeans2, vq
+
+from recommender import jensen_shannon, get_most_similar_and_diff_documents, select_k_smallest
+
+# ---------------------------------------------------------------------------- #
+# APPROXIMATE NEAREST NEIGHBOR INDEX
+# ---------------------------------------------------------------------------- #
+
+# Saved index over the final LDA document-topic matrix
+ann_index_path = 'Models/topic_ann.npz'
+
+class TopicANNIndex:
+    """
+    Inverted file index over LDA document-topic distributions.
+
+    Each distribution p is embedded as sqrt(p), under which the Hellinger distance
+    is Euclidean. The embeddings are clustered with k-means into n_lists lists; a
+    query only scans the documents in the n_probe lists whose centroids are closest,
+    and re-ranks those candidates by exact Jensen-Shannon distance. Raising n_probe
+    trades speed for recall, and with n_lists around sqrt(N) a query scans roughly
+    n_probe * sqrt(N) documents instead of N.
+    """
+
+    def __init__(self, centroids, list_offsets, list_ids, embeddings):
+        self.centroids = centroids       # n_lists x K centroids of sqrt embeddings
+        self.list_offsets = list_offsets # start of each list in list_ids, plus end
+        self.list_ids = list_ids         # positional document indices grouped by list
+        self.embeddings = embeddings     # N x K sqrt embeddings, in list_ids order
+
+    # Build index from an N x K document-topic matrix
+    @classmethod
+    def build(cls, matrix, n_lists=None, n_iter=20, train_size=100000, seed=0):
+        matrix = np.asarray(matrix, dtype=float)
+        matrix = matrix / matrix.sum(axis=1, keepdims=True)
+        embeddings = np.sqrt(matrix)
+        n_docs = len(embeddings)
+
+        if n_lists is None:
+            n_lists = max(1, int(np.sqrt(n_docs)))
+
+        # Train centroids on a sample for large corpora
+        random_state = np.random.RandomState(seed)
+        if n_docs > train_size:
+            train = embeddings[random_state.choice(n_docs, train_size, replace=False)]
+        else:
+            train = embeddings
+        init = train[random_state.choice(len(train), n_lists, replace=False)]
+        centroids, _ = kmeans2(train, init, iter=n_iter, minit='matrix')
+
+        # Group documents by nearest centroid
+        labels, _ = vq(embeddings, centroids)
+        list_ids = np.argsort(labels, kind='stable')
+        list_offsets = np.searchsorted(labels[list_ids], np.arange(n_lists + 1))
+
+        return cls(centroids.astype(np.float32), list_offsets, list_ids,
+                   embeddings[list_ids].astype(np.float32))
+
+    # Add documents to the index, numbered after the documents already indexed
+    def add(self, matrix):
+        """
+        Assigns the rows of matrix (new document-topic distributions, appended to
+        the corpus in order) to their nearest existing centroids. Centroids are
+        not retrained, so rebuild the index after large additions.
+        """
+        matrix = np.asarray(matrix, dtype=float)
+        embeddings = np.sqrt(matrix / matrix.sum(axis=1, keepdims=True)).astype(np.float32)
+        new_labels, _ = vq(embeddings, self.centroids)
+
+        n_lists = len(self.centroids)
+        n_old = len(self.list_ids)
+        labels = np.concatenate([np.repeat(np.arange(n_lists), np.diff(self.list_offsets)), new_labels])
+        ids = np.concatenate([self.list_ids, np.arange(n_old, n_old + len(matrix))])
+
+        order = np.argsort(labels, kind='stable')
+        self.list_ids = ids[order]
+        self.embeddings = np.concatenate([self.embeddings, embeddings])[order]
+        self.list_offsets = np.searchsorted(labels[order], np.arange(n_lists + 1))
+
+    # Positions (in list_ids order) of the documents in the n_probe closest lists
+    def _candidates(self, embedding, n_probe):
+        n_probe = min(n_probe, len(self.centroids))
+        centroid_dists = ((self.centroids - embedding) ** 2).sum(axis=1)
+        probe = np.argpartition(centroid_dists, n_probe - 1)[:n_probe]
+
+        return np.concatenate([np.arange(self.list_offsets[i], self.list_offsets[i + 1])
+                               for i in probe])
+
+    # Get approximate k most similar documents to query
+    def query(self, query, k=10, n_probe=8, exclude=None):
+        """
+        Returns the positional indices of the (approximately) k most similar documents
+        to query by Jensen-Shannon distance, most similar first. The positional index
+        in exclude, usually the query talk itself, is never returned.
+        """
+        query = np.asarray(query, dtype=float)
+        query = query / query.sum()
+        positions = self._candidates(np.sqrt(query), n_probe)
+
+        candidate_ids = self.list_ids[positions]
+        candidates = self.embeddings[positions].astype(float) ** 2
+
+        # Rounding of the float32 embeddings can make the divergence of near
+        # duplicates slightly negative, so treat NaN distances as 0
+        with np.errstate(invalid='ignore'):
+            sims = np.nan_to_num(jensen_shannon(query, candidates), nan=0.0)
+
+        if exclude is not None:
+            sims[candidate_ids == exclude] = np.inf
+            k = min(k, len(sims) - np.count_nonzero(candidate_ids == exclude))
+
+        return candidate_ids[select_k_smallest(sims, k)]
+
+    # Measure recall@k against exact nearest neighbors
+    def recall_at_k(self, matrix, k=10, n_probe=8, sample=200, seed=0):
+        """
+        Returns the average fraction of the exact k most similar documents (from
+        get_most_similar_and_diff_documents, excluding the query talk by index so
+        that duplicate or tied rows are counted like any other neighbor) that
+        query returns, over a sample of documents in matrix used as queries.
+        """
+        matrix = np.asarray(matrix, dtype=float)
+        random_state = np.random.RandomState(seed)
+        indices = random_state.choice(len(matrix), min(sample, len(matrix)), replace=False)
+
+        recalls = []
+        for index in indices:
+            exact, _ = get_most_similar_and_diff_documents(matrix[index], matrix, k = k, exclude = index)
+            approx = self.query(matrix[index], k = k, n_probe = n_probe, exclude = index)
+            recalls.append(len(np.intersect1d(exact, approx)) / len(exact))
+
+        return float(np.mean(recalls))
+
+    # Save index to a single .npz file
+    def save(self, path):
+        np.savez(path, centroids=self.centroids, list_offsets=self.list_offsets,
+                 list_ids=self.list_ids, embeddings=self.embeddings)
+
+    # Load index saved with save
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['centroids'], data['list_offsets'],
+                       data['list_ids'], data['embeddings'])
+
+# ---------------------------------------------------------------------------- #
+# BUILD INDEX
+# ---------------------------------------------------------------------------- #
+
+if __name__ == '__main__':
+    from columnar import load_columnar_or_pickle
+
+    # First 15 columns of the final LDA document-topic matrix are the topic proportions
+    matrix = np.asarray(load_columnar_or_pickle('Models/final_lda_dtm.pkl').iloc[:, :15], dtype=float)
+    index = TopicANNIndex.build(matrix)
+    index.save(ann_index_path)
+    print(f'Indexed {len(matrix)} talks in {len(index.centroids)} lists; '
+          f'recall@10 {index.recall_at_k(matrix):.3f} (n_probe=8)')
@@ -0,0 +1,95 @@
+# ---------------------------------------------------------------------------- #
+# IMPORT PACKAGES
+# ---------------------------------------------------------------------------- #
+
+import os
+import pickle
+import threading
+import time
+
+from columnar import columnar_path, load_columnar_or_pickle, manifest_path
+
+# ---------------------------------------------------------------------------- #
+# ARTIFACT STORE
+# ---------------------------------------------------------------------------- #
+
+# Unpickles an artifact file
+def load_pickle(path):
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+# Files an artifact is read from: its pickle and, once converted, the manifest of
+# its columnar version (see columnar.py), which is loaded in preference while it
+# is current with the pickle
+def source_paths(path):
+    return [path, manifest_path(columnar_path(path))]
+
+# Modification time of a file, or None if it does not exist
+def get_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+class ArtifactStore:
+    """
+    Process-wide cache of loaded artifacts (pickled data, models, and values derived
+    from them). Streamlit re-runs interface.py on every widget interaction, but
+    imported modules persist, so one store is shared by every rerun and session.
+
+    Each entry is loaded on first access and reloaded when the modification time of
+    any file it depends on changes. File times are checked at most once every
+    check_interval seconds per entry, so rapid interactions such as slider moves do
+    not touch the disk at all.
+    """
+
+    def __init__(self, check_interval=5.0):
+        self.check_interval = check_interval
+        self.entries = {}    # name -> (value, paths, mtimes, last_checked)
+        self.load_times = {} # name -> seconds taken by the most recent load
+        self.lock = threading.RLock()
+
+    # Get a value built from files, (re)building it if needed
+    def derived(self, name, paths, build):
+        """
+        Returns build(), cached under name until the modification time of one of
+        paths changes.
+        """
+        with self.lock:
+            entry = self.entries.get(name)
+            now = time.monotonic()
+
+            if entry is not None:
+                value, _, mtimes, last_checked = entry
+                if now - last_checked < self.check_interval:
+                    return value
+                if [get_mtime(path) for path in paths] == mtimes:
+                    self.entries[name] = (value, paths, mtimes, now)
+                    return value
+
+            mtimes = [get_mtime(path) for path in paths]
+            start = time.perf_counter()
+            value = build()
+            self.load_times[name] = time.perf_counter() - start
+            print(f'Loaded {name} in {self.load_times[name]:.3f}s')
+
+            self.entries[name] = (value, paths, mtimes, now)
+            return value
+
+    # Get the contents of a file
+    def load(self, path, loader=load_columnar_or_pickle):
+        return self.derived(path, source_paths(path), lambda: loader(path))
+
+    # Drop every cached entry
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+# Shared store used by the app
+store = ArtifactStore()
+
+def load(path, loader=load_columnar_or_pickle):
+    return store.load(path, loader)
+
+def derived(name, paths, build):
+    return store.derived(name, paths, build)
@@ -0,0 +1,532 @@
+# ---------------------------------------------------------------------------- #
+# IMPORT PACKAGES
+# ---------------------------------------------------------------------------- #
+
+from collections.abc import Sequence
+import hashlib
+import json
+import os
+import pickle
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------------------------------- #
+# COLUMNAR ARTIFACT FORMAT
+# ---------------------------------------------------------------------------- #
+
+# An artifact is a directory holding one .npy file per array and a manifest.json
+# recording what the artifact is (its kind), and the file, shape, dtype and sha256
+# checksum of every array. Arrays are opened with np.load(mmap_mode='r'), so
+# loading reads only the manifest and maps the files: processes serving the same
+# artifact share its pages instead of each unpickling a private copy.
+#
+# Kinds of artifact:
+#   frame    DataFrame; runs of adjacent numeric columns of one dtype are stored
+#            together as a 2-D block (rows x columns), which becomes one pandas
+#            block without copying, and other columns and the index one by one
+#   array    a single NumPy array
+#   strings  list of strings
+#   lists    list of lists of strings (e.g. tokens per document)
+#   mapping  dict of string -> number (e.g. token counts)
+#
+# Strings are stored Arrow-style as a uint8 buffer of UTF-8 bytes and int64
+# offsets into it, so they are mapped like any other array.
+#
+# An artifact converted from a pickle records the pickle's size, modification
+# time and sha256, so a pickle rebuilt afterwards is not hidden by a stale copy.
+
+format_version = 1
+
+manifest_name = 'manifest.json'
+
+# Directory of the columnar artifact for a pickle, e.g. Data/all_tok.pkl -> Data/all_tok
+def columnar_path(pickle_path):
+    return os.path.splitext(pickle_path)[0]
+
+def manifest_path(directory):
+    return os.path.join(directory, manifest_name)
+
+# sha256 of a file
+def file_checksum(path, chunk_size=1 << 20):
+    checksum = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+# ---------------------------------------------------------------------------- #
+# STRING COLUMNS
+# ---------------------------------------------------------------------------- #
+
+class StringColumn(Sequence):
+    """
+    Read-only sequence of strings backed by a buffer of UTF-8 bytes and offsets
+    (string i is data[offsets[i]:offsets[i + 1]]). Strings are decoded on access.
+    valid, if given, is a boolean array that is False where the string is missing
+    (returned as None).
+    """
+
+    def __init__(self, data, offsets, valid=None):
+        self.data = data
+        self.offsets = offsets
+        self.valid = valid
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if self.valid is not None and not self.valid[index]:
+            return None
+        return bytes(self.data[self.offsets[index]:self.offsets[index + 1]]).decode('utf-8')
+
+    def __iter__(self):
+        data, offsets, valid = self.data, self.offsets, self.valid
+        for index in range(len(self)):
+            if valid is not None and not valid[index]:
+                yield None
+            else:
+                yield bytes(data[offsets[index]:offsets[index + 1]]).decode('utf-8')
+
+    def tolist(self):
+        return list(self)
+
+class ListColumn(Sequence):
+    """
+    Read-only sequence of lists of strings: list i is
+    values[offsets[i]:offsets[i + 1]], where values is a StringColumn.
+    """
+
+    def __init__(self, values, offsets):
+        self.values = values
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return self.values[int(self.offsets[index]):int(self.offsets[index + 1])]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def tolist(self):
+        return list(self)
+
+# Missing value in a string column
+def is_missing(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+# Encode strings (None or NaN for missing) as (data, offsets, valid)
+def encode_strings(strings):
+    strings = list(strings)
+    valid = np.fromiter((isinstance(string, str) for string in strings), dtype=bool, count=len(strings))
+    encoded = [string.encode('utf-8') if is_valid else b'' for string, is_valid in zip(strings, valid)]
+
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(string) for string in encoded], out=offsets[1:])
+    data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+    return data, offsets, (None if valid.all() else valid)
+
+# Encode lists of strings as (data, offsets, list offsets)
+def encode_lists(lists):
+    lists = list(lists)
+    list_offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum([len(values) for values in lists], out=list_offsets[1:])
+    data, offsets, _ = encode_strings(value for values in lists for value in values)
+    return data, offsets, list_offsets
+
+# ---------------------------------------------------------------------------- #
+# WRITE ARTIFACTS
+# ---------------------------------------------------------------------------- #
+
+class ArtifactWriter:
+    """
+    Writes the arrays of one artifact and its manifest. Arrays are written to a
+    temporary directory that replaces the artifact only once the manifest is
+    complete, so readers never see a partially written artifact.
+    """
+
+    def __init__(self, directory, kind, **attributes):
+        self.directory = directory
+        self.tmp_directory = directory + '.tmp'
+        self.manifest = {'format_version': format_version, 'kind': kind,
+                         'arrays': {}, 'columns': [], **attributes}
+        self.open_arrays = {} # name -> memory-mapped array being filled in place
+
+        shutil.rmtree(self.tmp_directory, ignore_errors=True)
+        os.makedirs(self.tmp_directory)
+
+    # Write an array under name
+    def array(self, name, array):
+        array = np.ascontiguousarray(array)
+        file_name = name + '.npy'
+        path = os.path.join(self.tmp_directory, file_name)
+        np.save(path, array, allow_pickle=False)
+
+        self.manifest['arrays'][name] = {'file': file_name, 'shape': list(array.shape),
+                                         'dtype': array.dtype.str, 'sha256': file_checksum(path)}
+
+    # Create an array under name to be filled in place, returning a writable
+    # memory map; it is recorded in the manifest when the artifact is closed
+    def open_array(self, name, shape, dtype):
+        path = os.path.join(self.tmp_directory, name + '.npy')
+        array = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+        self.open_arrays[name] = array
+        return array
+
+    # Write a string column under name
+    def strings(self, name, strings):
+        data, offsets, valid = encode_strings(strings)
+        self.array(name + '.data', data)
+        self.array(name + '.offsets', offsets)
+        if valid is not None:
+            self.array(name + '.valid', valid)
+
+    # Write a column of lists of strings under name
+    def lists(self, name, lists):
+        data, offsets, list_offsets = encode_lists(lists)
+        self.array(name + '.data', data)
+        self.array(name + '.offsets', offsets)
+        self.array(name + '.list_offsets', list_offsets)
+
+    # Write a DataFrame column or index (a Series or Index) under name
+    def column(self, name, values):
+        values = pd.Series(values)
+
+        if isinstance(values.dtype, np.dtype) and values.dtype != object:
+            self.array(name, values.to_numpy())
+            column_type = 'numpy'
+        elif all(isinstance(value, str) or is_missing(value) for value in values):
+            self.strings(name, values)
+            column_type = 'strings'
+        elif all(isinstance(value, list) and all(isinstance(item, str) for item in value) for value in values):
+            self.lists(name, values)
+            column_type = 'lists'
+        else:
+            raise TypeError(f'Cannot store column {name!r}: values must be numbers, strings or lists of strings')
+
+        return column_type
+
+    # Record manifest and move artifact into place
+    def close(self):
+        for name, array in self.open_arrays.items():
+            array.flush()
+            file_name = name + '.npy'
+            self.manifest['arrays'][name] = {'file': file_name, 'shape': list(array.shape), 'dtype': array.dtype.str,
+                                             'sha256': file_checksum(os.path.join(self.tmp_directory, file_name))}
+        self.open_arrays.clear()
+
+        with open(manifest_path(self.tmp_directory), 'w') as file:
+            json.dump(self.manifest, file, indent=2)
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.replace(self.tmp_directory, self.directory)
+
+# Runs of adjacent numeric columns sharing a dtype, as (start, stop) positions
+def column_blocks(frame):
+    blocks = []
+    dtypes = list(frame.dtypes)
+    for position, dtype in enumerate(dtypes):
+        if not isinstance(dtype, np.dtype) or dtype == object:
+            continue
+        if blocks and blocks[-1][1] == position and dtypes[blocks[-1][0]] == dtype:
+            blocks[-1][1] += 1
+        else:
+            blocks.append([position, position + 1])
+    return [tuple(block) for block in blocks]
+
+# Manifest entries of the columns held in a block
+def block_columns(names, block):
+    return [{'name': name, 'type': 'block', 'block': block, 'position': position}
+            for position, name in enumerate(names)]
+
+# Write a DataFrame as a columnar artifact
+def write_frame(frame, directory, **attributes):
+    writer = ArtifactWriter(directory, 'frame', index_name=frame.index.name, **attributes)
+    columns = [None] * frame.shape[1]
+
+    for block, (start, stop) in enumerate(column_blocks(frame)):
+        writer.array(f'block{block}', frame.iloc[:, start:stop].to_numpy())
+        columns[start:stop] = block_columns(frame.columns[start:stop], f'block{block}')
+
+    for position, name in enumerate(frame.columns):
+        if columns[position] is None:
+            columns[position] = {'name': name, 'type': writer.column(f'column{position}', frame.iloc[:, position])}
+
+    writer.manifest['columns'] = columns
+    if frame.index.equals(pd.RangeIndex(len(frame))):
+        writer.manifest['index_type'] = 'range'
+        writer.manifest['n_rows'] = len(frame)
+    else:
+        writer.manifest['index_type'] = writer.column('index', frame.index.to_series())
+    writer.close()
+
+# Write a NumPy array as a columnar artifact
+def write_array(array, directory, **attributes):
+    writer = ArtifactWriter(directory, 'array', **attributes)
+    writer.array('values', array)
+    writer.close()
+
+# Write a list of strings as a columnar artifact
+def write_strings(strings, directory, **attributes):
+    writer = ArtifactWriter(directory, 'strings', **attributes)
+    writer.strings('values', strings)
+    writer.close()
+
+# Write a list of lists of strings as a columnar artifact
+def write_lists(lists, directory, **attributes):
+    writer = ArtifactWriter(directory, 'lists', **attributes)
+    writer.lists('values', lists)
+    writer.close()
+
+# Write a dict of string -> number as a columnar artifact
+def write_mapping(mapping, directory, **attributes):
+    writer = ArtifactWriter(directory, 'mapping', **attributes)
+    writer.strings('keys', mapping.keys())
+    writer.array('values', np.array(list(mapping.values())))
+    writer.close()
+
+# Write any supported object as a columnar artifact
+def write_artifact(obj, directory, source_path=None):
+    """
+    This function writes obj (a DataFrame, NumPy array, dict of string -> number,
+    list of strings, or list of lists of strings) as a columnar artifact in
+    directory, raising TypeError for anything else. If obj was read from the
+    pickle source_path, the pickle's size, modification time and checksum are
+    recorded (see is_current).
+    """
+    attributes = {} if source_path is None else source_attributes(source_path)
+
+    if isinstance(obj, pd.DataFrame):
+        write_frame(obj, directory, **attributes)
+    elif isinstance(obj, np.ndarray):
+        write_array(obj, directory, **attributes)
+    elif isinstance(obj, dict):
+        write_mapping(obj, directory, **attributes)
+    elif isinstance(obj, list) and all(isinstance(value, str) for value in obj):
+        write_strings(obj, directory, **attributes)
+    elif isinstance(obj, list) and all(isinstance(value, list) for value in obj):
+        write_lists(obj, directory, **attributes)
+    else:
+        raise TypeError(f'Cannot store object of type {type(obj).__name__} as a columnar artifact')
+
+# ---------------------------------------------------------------------------- #
+# READ ARTIFACTS
+# ---------------------------------------------------------------------------- #
+
+# Read manifest of an artifact
+def read_manifest(directory):
+    with open(manifest_path(directory)) as file:
+        manifest = json.load(file)
+    if manifest['format_version'] != format_version:
+        raise ValueError(f'{directory} has format version {manifest["format_version"]}, expected {format_version}')
+    return manifest
+
+# Memory-map every array of an artifact
+def load_arrays(directory, manifest=None):
+    """
+    This function returns a dictionary of name -> read-only memory-mapped array
+    for every array in the artifact. Shapes and dtypes are checked against the
+    manifest; checksums are not (see verify_artifact), since hashing would read
+    every byte of the file.
+    """
+    manifest = read_manifest(directory) if manifest is None else manifest
+
+    arrays = {}
+    for name, entry in manifest['arrays'].items():
+        array = np.load(os.path.join(directory, entry['file']), mmap_mode='r', allow_pickle=False)
+        if list(array.shape) != entry['shape'] or array.dtype.str != entry['dtype']:
+            raise ValueError(f'{directory}/{entry["file"]} does not match its manifest')
+        # Plain ndarray view of the mapping, so pandas and NumPy treat it like any array
+        arrays[name] = array.view(np.ndarray)
+
+    return arrays
+
+# Check checksums of every array of an artifact
+def verify_artifact(directory):
+    manifest = read_manifest(directory)
+    for entry in manifest['arrays'].values():
+        if file_checksum(os.path.join(directory, entry['file'])) != entry['sha256']:
+            raise ValueError(f'Checksum mismatch for {directory}/{entry["file"]}')
+
+def get_strings(arrays, name):
+    return StringColumn(arrays[name + '.data'], arrays[name + '.offsets'], arrays.get(name + '.valid'))
+
+def get_lists(arrays, name):
+    return ListColumn(StringColumn(arrays[name + '.data'], arrays[name + '.offsets']),
+                      arrays[name + '.list_offsets'])
+
+# Values of a DataFrame column or index
+def get_column(arrays, name, column_type):
+    if column_type == 'numpy':
+        return arrays[name]
+    if column_type == 'strings':
+        return np.array(get_strings(arrays, name).tolist(), dtype=object)
+
+    values = np.empty(len(arrays[name + '.list_offsets']) - 1, dtype=object)
+    values[:] = get_lists(arrays, name).tolist()
+    return values
+
+# pandas before 3.0 copies concatenated frames unless told not to; 3.0 never
+# copies them eagerly and deprecates the keyword
+concat_options = {'copy': False} if int(pd.__version__.split('.')[0]) < 3 else {}
+
+# DataFrame of an artifact, each block of columns wrapping its array without copying
+def load_frame(arrays, manifest):
+    pieces = []
+    for position, column in enumerate(manifest['columns']):
+        if column['type'] == 'block':
+            if column['position'] == 0:
+                pieces.append(pd.DataFrame(arrays[column['block']], copy=False))
+        else:
+            # Single columns; numeric ones are from artifacts written before blocks
+            values = get_column(arrays, f'column{position}', column['type'])
+            pieces.append(pd.DataFrame(values.reshape(-1, 1), copy=False) if column['type'] == 'numpy'
+                          else pd.DataFrame({0: values}))
+
+    if manifest['index_type'] == 'range':
+        index = pd.RangeIndex(manifest['n_rows'], name=manifest['index_name'])
+    else:
+        index = pd.Index(get_column(arrays, 'index', manifest['index_type']), name=manifest['index_name'])
+
+    frame = pd.concat(pieces, axis=1, **concat_options) if len(pieces) > 1 else pieces[0]
+    frame.columns = [column['name'] for column in manifest['columns']]
+    frame.index = index
+    return frame
+
+# Load a columnar artifact
+def load_artifact(directory):
+    """
+    This function loads a columnar artifact as the kind of object it was written
+    from. Arrays, numeric DataFrame columns and string lists are memory-mapped
+    without copying; string and list columns of a DataFrame and the keys of a
+    mapping are decoded into Python objects, since pandas and dicts need them.
+    """
+    manifest = read_manifest(directory)
+    arrays = load_arrays(directory, manifest)
+    kind = manifest['kind']
+
+    if kind == 'frame':
+        return load_frame(arrays, manifest)
+    if kind == 'array':
+        return arrays['values']
+    if kind == 'strings':
+        return get_strings(arrays, 'values')
+    if kind == 'lists':
+        return get_lists(arrays, 'values')
+    if kind == 'mapping':
+        return dict(zip(get_strings(arrays, 'keys'), arrays['values'].tolist()))
+
+    raise ValueError(f'Unknown artifact kind {kind!r} in {directory}')
+
+# Size, modification time and checksum of a pickle an artifact is converted from
+def source_attributes(path):
+    status = os.stat(path)
+    return {'source_size': status.st_size, 'source_mtime_ns': status.st_mtime_ns,
+            'source_sha256': file_checksum(path)}
+
+# (pickle path, size, modification time, expected sha256) -> whether it matched
+verified_sources = {}
+
+# Whether the columnar version of a pickle can be loaded in its place
+def is_current(directory, pickle_path):
+    """
+    This function returns True if the columnar artifact in directory exists and
+    either has no pickle to be stale against, was not converted from one, or was
+    converted from the pickle as it is now. The pickle's size and modification
+    time are compared with the manifest first, so it is only hashed (to compare
+    with source_sha256) when its size matches but its time does not, e.g. after
+    a checkout, and then only once per process.
+    """
+    if not os.path.exists(manifest_path(directory)):
+        return False
+    manifest = read_manifest(directory)
+    if manifest.get('source_sha256') is None or not os.path.exists(pickle_path):
+        return True
+
+    status = os.stat(pickle_path)
+    if status.st_size != manifest.get('source_size', status.st_size):
+        return False
+    if status.st_mtime_ns == manifest.get('source_mtime_ns'):
+        return True
+
+    # Hash once per process for each version of the pickle
+    key = (pickle_path, status.st_size, status.st_mtime_ns, manifest['source_sha256'])
+    if key not in verified_sources:
+        verified_sources[key] = file_checksum(pickle_path) == manifest['source_sha256']
+    return verified_sources[key]
+
+# Load the artifact for a pickle, preferring its columnar version if it is current
+def load_columnar_or_pickle(pickle_path):
+    directory = columnar_path(pickle_path)
+    if is_current(directory, pickle_path):
+        return load_artifact(directory)
+    if os.path.exists(manifest_path(directory)):
+        print(f'{directory} is out of date with {pickle_path}; loading the pickle '
+              f'(run columnar.py to convert it again)')
+
+    with open(pickle_path, 'rb') as file:
+        return pickle.load(file)
+
+# ---------------------------------------------------------------------------- #
+# CONVERT PICKLES
+# ---------------------------------------------------------------------------- #
+
+# Pickled artifacts read by the app
+pickle_paths = ['Models/final_lda_dtm.pkl',
+                'Data/final_raw_data.pkl',
+                'Data/final_tok.pkl',
+                'Data/all_tok.pkl',
+                'Data/doc_tok_counts.pkl']
+
+# Convert pickles to columnar artifacts
+def convert_pickles(paths=pickle_paths, verify=True):
+    """
+    This function writes a columnar artifact next to each pickle in paths (e.g.
+    Data/all_tok.pkl -> Data/all_tok/), skipping pickles that do not exist.
+    If verify, each artifact is read back and compared with the pickle.
+    """
+    for path in paths:
+        if not os.path.exists(path):
+            print(f'Skipping {path}: not found')
+            continue
+
+        with open(path, 'rb') as file:
+            obj = pickle.load(file)
+        directory = columnar_path(path)
+        write_artifact(obj, directory, source_path=path)
+
+        if verify:
+            verify_artifact(directory)
+            loaded = load_artifact(directory)
+            if isinstance(obj, pd.DataFrame):
+                # Values must match; dtypes of string columns depend on the pandas version
+                pd.testing.assert_frame_equal(loaded, obj, check_dtype=False,
+                                              check_index_type=False, check_column_type=False)
+            elif isinstance(obj, np.ndarray):
+                np.testing.assert_array_equal(loaded, obj)
+            elif isinstance(obj, dict):
+                assert loaded == obj
+            else:
+                assert loaded.tolist() == obj
+
+        print(f'Converted {path} -> {directory}')
+
+# ---------------------------------------------------------------------------- #
+# CONVERT APP PICKLES
+# ---------------------------------------------------------------------------- #
+
+if __name__ == '__main__':
+    convert_pickles()
@@ -0,0 +1,70 @@
+# ---------------------------------------------------------------------------- #
+# IMPORT PACKAGES
+# ---------------------------------------------------------------------------- #
+
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------------------------------- #
+# TOPIC CO-OCCURRENCE ENGINE
+# ---------------------------------------------------------------------------- #
+
+topic_names = ['General', 'Science', 'Tech', 'Politics', 'Problems', 'Personal',
+               'AI', 'Miscellaneous', 'Healthcare', 'Linguistics/Humanities', 'Space',
+               'Agriculture/Nature', 'Gender/Sexuality', 'Audio/Visual', 'Urban Planning/Design']
+
+rank_columns = ['dominant_topic', 'secondary_topic', 'tertiary_topic']
+
+# Pairs of ranks, as (first rank, second rank) positions in rank_columns
+rank_pairs = [(0, 1), (0, 2), (1, 2)]
+
+# Count co-occurrences of topic ranks
+def topic_cooccurrence(lda_dtm, mask=None, n_topics=len(topic_names)):
+    """
+    This function counts, for every pair of topic ranks (dominant/secondary,
+    dominant/tertiary, secondary/tertiary), how many documents have each pair of
+    topics at those ranks. It returns a 3 x n_topics x n_topics integer array,
+    where counts[pair, a, b] is the number of documents whose topic at the first
+    rank of rank_pairs[pair] is a and at the second rank is b.
+    mask optionally restricts the count to a boolean subset of documents.
+    """
+    ranks = np.asarray(lda_dtm[rank_columns], dtype=np.int64)
+    if mask is not None:
+        ranks = ranks[np.asarray(mask, dtype=bool)]
+
+    counts = np.empty((len(rank_pairs), n_topics, n_topics), dtype=np.int64)
+    for pair, (first, second) in enumerate(rank_pairs):
+        counts[pair] = np.bincount(ranks[:, first] * n_topics + ranks[:, second],
+                                   minlength=n_topics * n_topics).reshape(n_topics, n_topics)
+
+    return counts
+
+# Documents recorded in a given year (or range of years)
+def year_mask(talk_df, start_year, end_year=None):
+    years = pd.to_datetime(talk_df.date_recorded).dt.year
+    end_year = start_year if end_year is None else end_year
+    return ((years >= start_year) & (years <= end_year)).values
+
+# Documents with a given TED tag
+def tag_mask(talk_df, tag):
+    return np.fromiter((tag in tags for tags in talk_df.tags), dtype=bool, count=len(talk_df))
+
+# Co-occurrences of two topic ranks as a labelled dataframe
+def cooccurrence_frame(lda_dtm, first_column, second_column, mask=None):
+    """
+    This function returns the co-occurrence counts of the topics in first_column and
+    second_column (two of rank_columns) as a dataframe with one row per topic that
+    appears in first_column, in order of first appearance, and one column per topic.
+    """
+    first = rank_columns.index(first_column)
+    second = rank_columns.index(second_column)
+    counts = topic_cooccurrence(lda_dtm, mask)[rank_pairs.index((first, second))]
+
+    # Rows in order of first appearance of each topic
+    topics = np.asarray(lda_dtm[first_column], dtype=np.int64)
+    if mask is not None:
+        topics = topics[np.asarray(mask, dtype=bool)]
+    present, first_seen = np.unique(topics, return_index=True)
+    rows = present[np.argsort(first_seen)]
+
+    return pd.DataFrame(counts[rows], index=[topic_names[row] for row in rows], columns=topic_names)
@@ -0,0 +1,130 @@
+# ---------------------------------------------------------------------------- #
+# IMPORT PACKAGES
+# ---------------------------------------------------------------------------- #
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from columnar import ArtifactWriter, block_columns, load_artifact
+
+# ---------------------------------------------------------------------------- #
+# TOPIC RANKS
+# ---------------------------------------------------------------------------- #
+
+rank_names = ['dominant_topic', 'secondary_topic', 'tertiary_topic']
+
+# Names of the first n_ranks rank columns
+def get_rank_names(n_ranks):
+    return rank_names[:n_ranks] + [f'topic_rank_{rank + 1}' for rank in range(len(rank_names), n_ranks)]
+
+# Top n_ranks topics of every document
+def top_topic_ranks(doc_topic, n_ranks=3):
+    """
+    This function returns an N x n_ranks integer array whose column j holds, for
+    every row of doc_topic (N x K topic proportions), the topic with the (j+1)-th
+    largest proportion. Only the top n_ranks entries of each row are selected
+    (argpartition) and sorted; ties go to the lower topic index.
+    """
+    n_topics = doc_topic.shape[1]
+    n_ranks = min(n_ranks, n_topics)
+
+    if n_ranks < n_topics:
+        top = np.argpartition(-doc_topic, n_ranks - 1, axis=1)[:, :n_ranks]
+    else:
+        top = np.broadcast_to(np.arange(n_topics), doc_topic.shape)
+    values = np.take_along_axis(doc_topic, top, axis=1)
+
+    order = np.lexsort((top, -values), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+# ---------------------------------------------------------------------------- #
+# STREAMING DOCUMENT-TOPIC MATRIX
+# ---------------------------------------------------------------------------- #
+
+# Model used by pool workers, set once per worker by set_worker_model
+worker_model = None
+
+def set_worker_model(topic_model):
+    global worker_model
+    worker_model = topic_model
+
+# Topic proportions and ranks for a chunk of rows of the document-term matrix
+def transform_chunk(topic_model, dtm_chunk, n_ranks):
+    doc_topic = topic_model.transform(dtm_chunk)
+    return doc_topic, top_topic_ranks(doc_topic, n_ranks)
+
+def transform_worker_chunk(dtm_chunk, n_ranks):
+    return transform_chunk(worker_model, dtm_chunk, n_ranks)
+
+# Transform chunks in order, in this process or across a process pool
+def iter_transformed_chunks(topic_model, dtm, chunk_size, n_ranks, n_jobs):
+    starts = range(0, dtm.shape[0], chunk_size)
+
+    if n_jobs == 1:
+        for start in starts:
+            yield start, transform_chunk(topic_model, dtm[start:start + chunk_size], n_ranks)
+        return
+
+    # The model is sent to each worker once; at most 2 * n_jobs chunks are in
+    # flight, so finished chunks do not pile up in memory
+    with ProcessPoolExecutor(n_jobs, initializer=set_worker_model, initargs=(topic_model,)) as executor:
+        pending = deque()
+        for start in starts:
+            pending.append((start, executor.submit(transform_worker_chunk, dtm[start:start + chunk_size], n_ranks)))
+            if len(pending) >= 2 * n_jobs:
+                start, future = pending.popleft()
+                yield start, future.result()
+        while pending:
+            start, future = pending.popleft()
+            yield start, future.result()
+
+# Build document-topic matrix with top topic ranks, chunk by chunk
+def build_dtm(topic_model, dtm, directory=None, chunk_size=10000, n_ranks=3, n_jobs=1,
+              topic_names=None, dtype=np.float64):
+    """
+    This function transforms the document-term matrix dtm (N x V, usually sparse)
+    with topic_model in chunks of chunk_size rows, optionally across n_jobs
+    processes, and returns a DataFrame with one column of topic proportions per
+    topic (named topic_names, default Topic0, Topic1, ...) followed by the top
+    n_ranks topics of each document (dominant_topic, secondary_topic,
+    tertiary_topic, ...). Rank columns use the smallest unsigned integer type
+    that holds every topic index (uint8 for up to 256 topics), not int64, so
+    cast them before arithmetic that could overflow.
+
+    If directory is given, every chunk is written straight into the memory-mapped
+    topic and rank blocks of a columnar artifact there (see columnar.py), so
+    neither the dense output nor its ranks are ever held in RAM, and the returned
+    DataFrame is memory-mapped from that artifact. Rows are indexed 0 to N - 1.
+    """
+    n_docs = dtm.shape[0]
+    n_topics = topic_model.n_components
+    n_ranks = min(n_ranks, n_topics)
+    if topic_names is None:
+        topic_names = ['Topic' + str(topic) for topic in range(n_topics)]
+    rank_dtype = np.min_scalar_type(n_topics - 1)
+
+    if directory is None:
+        writer = None
+        topic_block = np.empty((n_docs, n_topics), dtype=dtype)
+        rank_block = np.empty((n_docs, n_ranks), dtype=rank_dtype)
+    else:
+        writer = ArtifactWriter(directory, 'frame', index_name=None, index_type='range', n_rows=n_docs)
+        topic_block = writer.open_array('block0', (n_docs, n_topics), dtype)
+        rank_block = writer.open_array('block1', (n_docs, n_ranks), rank_dtype)
+
+    for start, (doc_topic, ranks) in iter_transformed_chunks(topic_model, dtm, chunk_size, n_ranks, n_jobs):
+        end = start + len(doc_topic)
+        topic_block[start:end] = doc_topic
+        rank_block[start:end] = ranks
+
+    if writer is None:
+        return pd.concat([pd.DataFrame(topic_block, columns=topic_names, copy=False),
+                          pd.DataFrame(rank_block, columns=get_rank_names(n_ranks), copy=False)], axis=1)
+
+    writer.manifest['columns'] = (block_columns(topic_names, 'block0') +
+                                  block_columns(get_rank_names(n_ranks), 'block1'))
+    writer.close()
+    return load_artifact(directory)
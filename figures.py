@@ -2,54 +2,113 @@
 # IMPORT PACKAGES
 # ---------------------------------------------------------------------------- #
 
-from collections import Counter
 import numpy as np
 import pandas as pd
-import pickle
 import plotly.offline as py
 import plotly.graph_objects as go
 
+import artifacts
+from columnar import manifest_path
+from cooccurrence import cooccurrence_frame
+from token_corpus import get_token_corpus, token_corpus_path
+
 # ---------------------------------------------------------------------------- #
-# LOAD DATA
+# FIGURE REGISTRY
 # ---------------------------------------------------------------------------- #
 
-# Load final dataset
-with open('Data/final_raw_data.pkl', 'rb') as file:
-    talk_df = pickle.load(file)
+# Figures are built the first time they are requested (e.g. figures.views or
+# get_figure('views')) and memoized in the artifact store. Each figure and each
+# intermediate dataset declares the data it depends on, so only the files that
+# figure needs are loaded, and it is rebuilt if one of those files changes.
+
+# Data files, by name
+data_paths = {'talk_df': 'Data/final_raw_data.pkl',
+              'doc_counts': 'Data/doc_tok_counts.pkl',
+              'all_lda_output': 'Models/final_lda_dtm.pkl'}
+
+# Data read by a load function rather than from a single file, by name:
+# (load function, files it reads)
+data_loaders = {'token_corpus': (get_token_corpus, [manifest_path(token_corpus_path), 'Data/final_tok.pkl'])}
+
+# Name -> (build function, names of data it depends on)
+data_builders = {}
+figure_builders = {}
+
+# Register function building a dataset from other data
+def data(name, *dependencies):
+    def register(build):
+        data_builders[name] = (build, dependencies)
+        return build
+    return register
+
+# Register function building a figure from data
+def figure(name, *dependencies):
+    def register(build):
+        figure_builders[name] = (build, dependencies)
+        return build
+    return register
+
+# Files that data ultimately depend on
+def dependency_paths(dependencies):
+    paths = []
+    for name in dependencies:
+        if name in data_paths:
+            paths.extend(artifacts.source_paths(data_paths[name]))
+        elif name in data_loaders:
+            paths.extend(data_loaders[name][1])
+        else:
+            paths.extend(dependency_paths(data_builders[name][1]))
+    return sorted(set(paths))
+
+# Get data by name, loading or building it on first use
+def get_data(name):
+    if name in data_paths:
+        return artifacts.load(data_paths[name])
+    if name in data_loaders:
+        load, paths = data_loaders[name]
+        return artifacts.derived('figures.' + name, paths, load)
+
+    build, dependencies = data_builders[name]
+    return artifacts.derived('figures.' + name, dependency_paths(dependencies),
+                             lambda: build(*[get_data(dependency) for dependency in dependencies]))
+
+# Get figure by name, building it on first use
+def get_figure(name):
+    build, dependencies = figure_builders[name]
+    return artifacts.derived('figures.' + name, dependency_paths(dependencies),
+                             lambda: build(*[get_data(dependency) for dependency in dependencies]))
+
+# Allow figures to be used as module attributes, e.g. figures.views
+def __getattr__(name):
+    if name in figure_builders:
+        return get_figure(name)
+    raise AttributeError(f"module 'figures' has no attribute '{name}'")
 
-# Load in tokenized documents
-with open('Data/final_tok.pkl', 'rb') as file:
-    tok_doc = pickle.load(file)
+# ---------------------------------------------------------------------------- #
+# DATA
+# ---------------------------------------------------------------------------- #
 
-# Load in corpus of tokens
-with open('Data/all_tok.pkl', 'rb') as file:
-    tok_corpus = pickle.load(file)
+# Create dictionary of token counts for entire corpus
+@data('word_bank', 'token_corpus')
+def build_word_bank(token_corpus):
+    return token_corpus.count_dict(token_corpus.term_counts())
 
-# Create dictionary of token counts for entire tok_corpus
-word_bank = dict(Counter(tok_corpus))
-words_less = {key: value for key, value in word_bank.items() if value < 100}
-words_more = {key: value for key, value in word_bank.items() if value >= 100}
+@data('words_less', 'word_bank')
+def build_words_less(word_bank):
+    return {key: value for key, value in word_bank.items() if value < 100}
 
-# Load in number of documents tokens appear in
-with open('Data/doc_tok_counts.pkl', 'rb') as file:
-    doc_counts = pickle.load(file)
+@data('words_more', 'word_bank')
+def build_words_more(word_bank):
+    return {key: value for key, value in word_bank.items() if value >= 100}
 
 # Create dictionary of token counts by appearances in documents
-docs_less = {key: value for key, value in doc_counts.items() if value < 100}
-docs_more = {key: value for key, value in doc_counts.items() if value >= 100}
-
-# Load final LDA document-topic matrix
-with open('Models/final_lda_dtm.pkl', 'rb') as file:
-    all_lda_output = pickle.load(file)
-
-all_top_topics = all_lda_output[['dominant_topic', 'secondary_topic',
-                                 'tertiary_topic']]
+@data('docs_less', 'doc_counts')
+def build_docs_less(doc_counts):
+    return {key: value for key, value in doc_counts.items() if value < 100}
 
-all_top_topics = all_top_topics.replace({0: 'General', 1: 'Science', 2: 'Tech',
-                                         3: 'Politics', 4: 'Problems', 5: 'Personal',
-                                         6: 'AI', 7: 'Miscellaneous', 8: 'Healthcare',
-                                         9: 'Linguistics/Humanities', 10: 'Space', 11: 'Agriculture/Nature',
-                                         12: 'Gender/Sexuality', 13: 'Audio/Visual', 14: 'Urban Planning/Design'})
+@data('docs_more', 'doc_counts')
+def build_docs_more(doc_counts):
+    return {key: value for key, value in doc_counts.items() if value >= 100}
 
 # ---------------------------------------------------------------------------- #
 # CREATE FIGURES FOR FRONTEND AND EDA
@@ -60,201 +119,231 @@ all_top_topics = all_top_topics.replace({0: 'General', 1: 'Science', 2: 'Tech',
 # ---------------------------------------------------------------------------- #
 
 # Histogram of View Count
-views = go.Figure(data=[go.Histogram(x = talk_df.views,
-                                   marker_color = '#d62728',
-                                   opacity = 0.75)])
-views_title = f'Histogram of TED Talk View Counts (n = {len(talk_df.views)})'
-views.update_layout(title_text = views_title,
-                  xaxis_title_text = 'View Count',
-                  yaxis_title_text = 'Number of TED Talks',
-                  bargap = 0.1)
+@figure('views', 'talk_df')
+def build_views(talk_df):
+    views = go.Figure(data=[go.Histogram(x = talk_df.views,
+                                       marker_color = '#d62728',
+                                       opacity = 0.75)])
+    views_title = f'Histogram of TED Talk View Counts (n = {len(talk_df.views)})'
+    views.update_layout(title_text = views_title,
+                      xaxis_title_text = 'View Count',
+                      yaxis_title_text = 'Number of TED Talks',
+                      bargap = 0.1)
+    return views
 
 # Histogram of Log(View Count)
-views_log_data = [x for x in talk_df.views if x != 0]
-views_log_title = f'Histogram of Log(TED Talk View Counts) (n = {len(views_log_data)})'
+@figure('views_log', 'talk_df')
+def build_views_log(talk_df):
+    views_log_data = [x for x in talk_df.views if x != 0]
+    views_log_title = f'Histogram of Log(TED Talk View Counts) (n = {len(views_log_data)})'
 
-views_log = go.Figure(data=[go.Histogram(x = np.log(views_log_data),
-                                         marker_color = '#d62728',
-                                         opacity = 0.75)])
-views_log.update_layout(title_text = views_log_title,
-                        xaxis_title_text = 'Log(View Count)',
-                        yaxis_title_text = 'Number of TED Talks',
-                        bargap = 0.1)
+    views_log = go.Figure(data=[go.Histogram(x = np.log(views_log_data),
+                                             marker_color = '#d62728',
+                                             opacity = 0.75)])
+    views_log.update_layout(title_text = views_log_title,
+                            xaxis_title_text = 'Log(View Count)',
+                            yaxis_title_text = 'Number of TED Talks',
+                            bargap = 0.1)
+    return views_log
 
 # Histogram of Comments
-comm = go.Figure(data = go.Histogram(x = talk_df.comments,
-                                     marker_color = '#d62728',
-                                     opacity = 0.75))
-comm_title = f'Histogram of Comments (n = {sum(talk_df.comments.notnull())})'
-comm.update_layout(title_text = comm_title,
-                   xaxis_title_text = 'Number of Comments',
-                   yaxis_title_text = 'Number of TED Talks',
-                   bargap = 0.1)
+@figure('comm', 'talk_df')
+def build_comm(talk_df):
+    comm = go.Figure(data = go.Histogram(x = talk_df.comments,
+                                         marker_color = '#d62728',
+                                         opacity = 0.75))
+    comm_title = f'Histogram of Comments (n = {sum(talk_df.comments.notnull())})'
+    comm.update_layout(title_text = comm_title,
+                       xaxis_title_text = 'Number of Comments',
+                       yaxis_title_text = 'Number of TED Talks',
+                       bargap = 0.1)
+    return comm
 
 # ---------------------------------------------------------------------------- #
 # LINGUISTIC
 # ---------------------------------------------------------------------------- #
 
 # Histogram of Transcript Word Count
-word_count = go.Figure(data = go.Histogram(x = talk_df.transcript_wc,
-                                           marker_color = '#d62728',
-                                           opacity = 0.75))
-word_count_title = f'Histogram of Transcript Word Count (n = {sum(talk_df.transcript_wc.notnull())})'
-word_count.update_layout(title_text = 'Histogram of Transcript Word Count (n = 3646)',
-                         xaxis_title_text = 'Transcript Word Count',
-                         yaxis_title_text = 'Number of TED Talks',
-                         bargap = 0.1)
+@figure('word_count', 'talk_df')
+def build_word_count(talk_df):
+    word_count = go.Figure(data = go.Histogram(x = talk_df.transcript_wc,
+                                               marker_color = '#d62728',
+                                               opacity = 0.75))
+    word_count_title = f'Histogram of Transcript Word Count (n = {sum(talk_df.transcript_wc.notnull())})'
+    word_count.update_layout(title_text = 'Histogram of Transcript Word Count (n = 3646)',
+                             xaxis_title_text = 'Transcript Word Count',
+                             yaxis_title_text = 'Number of TED Talks',
+                             bargap = 0.1)
+    return word_count
 
 # Histogram of Tag Length
-tag_len = go.Figure(data = go.Histogram(x = talk_df.tag_len,
-                                        marker_color = '#d62728',
-                                        opacity = 0.75))
-tag_len_title = f'Histogram of Number of TED Assigned Tags (n = {sum(talk_df.tag_len.notnull())})'
-tag_len.update_layout(title_text = tag_len_title,
-                      xaxis_title_text = 'Number of Tags',
-                      yaxis_title_text = 'Number of TED Talks',
-                      bargap = 0.1)
+@figure('tag_len', 'talk_df')
+def build_tag_len(talk_df):
+    tag_len = go.Figure(data = go.Histogram(x = talk_df.tag_len,
+                                            marker_color = '#d62728',
+                                            opacity = 0.75))
+    tag_len_title = f'Histogram of Number of TED Assigned Tags (n = {sum(talk_df.tag_len.notnull())})'
+    tag_len.update_layout(title_text = tag_len_title,
+                          xaxis_title_text = 'Number of Tags',
+                          yaxis_title_text = 'Number of TED Talks',
+                          bargap = 0.1)
+    return tag_len
 
 # Histogram of Number of Distinct Tokens
-doc_tok_len = [len(set(doc_tok)) for doc_tok in tok_doc]
-doc_tok = go.Figure(data = go.Histogram(x = doc_tok_len,
-                                      marker_color = '#d62728',
-                                      opacity = 0.75))
-doc_tok_title = f'Histogram of Distinct Tokens (n = {len(doc_tok_len)})'
-doc_tok.update_layout(title_text = doc_tok_title,
-                      xaxis_title_text = 'Number of Distinct Tokens',
-                      yaxis_title_text = 'Number of TED Talks',
-                      bargap = 0.1)
+@figure('doc_tok', 'token_corpus')
+def build_doc_tok(token_corpus):
+    doc_tok_len = token_corpus.distinct_counts()
+    doc_tok = go.Figure(data = go.Histogram(x = doc_tok_len,
+                                          marker_color = '#d62728',
+                                          opacity = 0.75))
+    doc_tok_title = f'Histogram of Distinct Tokens (n = {len(doc_tok_len)})'
+    doc_tok.update_layout(title_text = doc_tok_title,
+                          xaxis_title_text = 'Number of Distinct Tokens',
+                          yaxis_title_text = 'Number of TED Talks',
+                          bargap = 0.1)
+    return doc_tok
 
 # ---------------------------------------------------------------------------- #
 # TEMPORAL
 # ---------------------------------------------------------------------------- #
 
 # Histogram of Talk Duration (Seconds)
-dur = go.Figure(data = go.Histogram(x = [dur/60 for dur in talk_df.duration],
-                                    xbins=dict(start=0,
-                                    end=max([dur/60 for dur in talk_df.duration]),
-                                    size=1),
-                                    marker_color = '#d62728',
-                                    opacity = 0.75))
-dur_title = f'Histogram of Talk Duration (n = {len(talk_df.duration)})'
-dur.update_layout(title_text = dur_title,
-                  xaxis_title_text = 'Duration (Minutes)',
-                  yaxis_title_text = 'Number of TED Talks',
-                  bargap = 0.1)
+@figure('dur', 'talk_df')
+def build_dur(talk_df):
+    dur = go.Figure(data = go.Histogram(x = [dur/60 for dur in talk_df.duration],
+                                        xbins=dict(start=0,
+                                        end=max([dur/60 for dur in talk_df.duration]),
+                                        size=1),
+                                        marker_color = '#d62728',
+                                        opacity = 0.75))
+    dur_title = f'Histogram of Talk Duration (n = {len(talk_df.duration)})'
+    dur.update_layout(title_text = dur_title,
+                      xaxis_title_text = 'Duration (Minutes)',
+                      yaxis_title_text = 'Number of TED Talks',
+                      bargap = 0.1)
+    return dur
 
 # Histogram of Date Recorded
-recorded = go.Figure(data = go.Histogram(x = talk_df[talk_df.date_recorded.notnull()].date_recorded,
-                                         marker_color = '#d62728',
-                                         opacity = 0.75))
-recorded_title = f'Histogram of Date Recorded (n = {len(talk_df[talk_df.date_recorded.notnull()])})'
-recorded.update_layout(title_text = recorded_title,
-                       xaxis_title_text = 'Date Recorded',
-                       yaxis_title_text = 'Number of TED Talks',
-                       bargap = 0.1)
+@figure('recorded', 'talk_df')
+def build_recorded(talk_df):
+    recorded = go.Figure(data = go.Histogram(x = talk_df[talk_df.date_recorded.notnull()].date_recorded,
+                                             marker_color = '#d62728',
+                                             opacity = 0.75))
+    recorded_title = f'Histogram of Date Recorded (n = {len(talk_df[talk_df.date_recorded.notnull()])})'
+    recorded.update_layout(title_text = recorded_title,
+                           xaxis_title_text = 'Date Recorded',
+                           yaxis_title_text = 'Number of TED Talks',
+                           bargap = 0.1)
+    return recorded
 
 # Histogram of Date Uploaded
-uploaded = go.Figure(data = go.Histogram(x = talk_df[talk_df.upload_date.notnull()].upload_date,
-                                         marker_color = '#d62728',
-                                         opacity = 0.75))
-uploaded_title = f'Histogram of Date Uploaded (n = {len(talk_df[talk_df.upload_date.notnull()])})'
-uploaded.update_layout(title_text = uploaded_title,
-                       xaxis_title_text = 'Date Uploaded',
-                       yaxis_title_text = 'Number of TED Talks',
-                       bargap = 0.1)
-
-# Calculate lag in upload
-upload_lag = talk_df[talk_df.upload_date.notnull()].upload_date - talk_df[talk_df.upload_date.notnull()].date_recorded
-upload_lag_days = [x.days for x in upload_lag if x.days >= 0]
+@figure('uploaded', 'talk_df')
+def build_uploaded(talk_df):
+    uploaded = go.Figure(data = go.Histogram(x = talk_df[talk_df.upload_date.notnull()].upload_date,
+                                             marker_color = '#d62728',
+                                             opacity = 0.75))
+    uploaded_title = f'Histogram of Date Uploaded (n = {len(talk_df[talk_df.upload_date.notnull()])})'
+    uploaded.update_layout(title_text = uploaded_title,
+                           xaxis_title_text = 'Date Uploaded',
+                           yaxis_title_text = 'Number of TED Talks',
+                           bargap = 0.1)
+    return uploaded
 
 # Histogram of Upload Lag
-lag = go.Figure(data = go.Histogram(x = upload_lag_days,
-                                    xbins=dict(start=0, end=max(upload_lag_days), size=90),
-                                    marker_color = '#d62728',
-                                    opacity = 0.75))
-lag_title = f'Histogram of Upload Lag (n = {len(upload_lag_days)})'
-lag.update_layout(title_text = lag_title,
-                   xaxis_title_text = 'Days Since Recorded',
-                   yaxis_title_text = 'Number of TED Talks',
-                   bargap = 0.1)
+@figure('lag', 'talk_df')
+def build_lag(talk_df):
+
+    # Calculate lag in upload
+    upload_lag = talk_df[talk_df.upload_date.notnull()].upload_date - talk_df[talk_df.upload_date.notnull()].date_recorded
+    upload_lag_days = [x.days for x in upload_lag if x.days >= 0]
+
+    lag = go.Figure(data = go.Histogram(x = upload_lag_days,
+                                        xbins=dict(start=0, end=max(upload_lag_days), size=90),
+                                        marker_color = '#d62728',
+                                        opacity = 0.75))
+    lag_title = f'Histogram of Upload Lag (n = {len(upload_lag_days)})'
+    lag.update_layout(title_text = lag_title,
+                       xaxis_title_text = 'Days Since Recorded',
+                       yaxis_title_text = 'Number of TED Talks',
+                       bargap = 0.1)
+    return lag
 
 # ---------------------------------------------------------------------------- #
 # TOKEN OCCURRENCE (CORPUS)
 # ---------------------------------------------------------------------------- #
 
 # Histogram of Token Occurrence in Entire Corpus
-corp_occur_a = go.Figure(data = go.Histogram(x = list(words_less.values()),
-                                             marker_color = '#d62728',
-                                             opacity = 0.75))
-corp_occur_a_title = f'Histogram of Tokens Appearing < 100 Times in Corpus (n = {len(words_less)})'
-corp_occur_a.update_layout(title_text = corp_occur_a_title,
-                           xaxis_title_text = corp_occur_a_title,
-                           yaxis_title_text = 'Number of Tokens',
-                           bargap = 0.1)
-
-corp_occur_b = go.Figure(data = go.Histogram(x = list(words_more.values()),
-                                             xbins=dict(start=0, end=max(list(words_more.values())), size=200),
-                                             marker_color = '#d62728',
-                                             opacity = 0.75))
-corp_occur_b_title = f'Histogram of Tokens Appearing 100+ Times in Corpus (n = {len(words_more)})'
-corp_occur_b.update_layout(title_text = corp_occur_b_title,
-                           xaxis_title_text = 'Token Frequency in Corpus',
-                           yaxis_title_text = 'Number of Tokens',
-                           bargap = 0.1)
+@figure('corp_occur_a', 'words_less')
+def build_corp_occur_a(words_less):
+    corp_occur_a = go.Figure(data = go.Histogram(x = list(words_less.values()),
+                                                 marker_color = '#d62728',
+                                                 opacity = 0.75))
+    corp_occur_a_title = f'Histogram of Tokens Appearing < 100 Times in Corpus (n = {len(words_less)})'
+    corp_occur_a.update_layout(title_text = corp_occur_a_title,
+                               xaxis_title_text = corp_occur_a_title,
+                               yaxis_title_text = 'Number of Tokens',
+                               bargap = 0.1)
+    return corp_occur_a
+
+@figure('corp_occur_b', 'words_more')
+def build_corp_occur_b(words_more):
+    corp_occur_b = go.Figure(data = go.Histogram(x = list(words_more.values()),
+                                                 xbins=dict(start=0, end=max(list(words_more.values())), size=200),
+                                                 marker_color = '#d62728',
+                                                 opacity = 0.75))
+    corp_occur_b_title = f'Histogram of Tokens Appearing 100+ Times in Corpus (n = {len(words_more)})'
+    corp_occur_b.update_layout(title_text = corp_occur_b_title,
+                               xaxis_title_text = 'Token Frequency in Corpus',
+                               yaxis_title_text = 'Number of Tokens',
+                               bargap = 0.1)
+    return corp_occur_b
 
 # ---------------------------------------------------------------------------- #
 # TOKEN OCCURRENCE (DOC)
 # ---------------------------------------------------------------------------- #
 
 # Histogram of tokens appearing in < 100 documents
-doc_occur_a = go.Figure(data = go.Histogram(x = list(docs_less.values()),
-                                            marker_color = '#d62728',
-                                            opacity = 0.75))
-doc_occur_a_title = f'Histogram of Tokens Appearing In < 100 Documents (n = {len(docs_less)})'
-doc_occur_a.update_layout(title_text = doc_occur_a_title,
-                          xaxis_title_text = 'Number of Documents Token Appears In',
-                          yaxis_title_text = 'Number of Tokens',
-                          bargap = 0.1)
+@figure('doc_occur_a', 'docs_less')
+def build_doc_occur_a(docs_less):
+    doc_occur_a = go.Figure(data = go.Histogram(x = list(docs_less.values()),
+                                                marker_color = '#d62728',
+                                                opacity = 0.75))
+    doc_occur_a_title = f'Histogram of Tokens Appearing In < 100 Documents (n = {len(docs_less)})'
+    doc_occur_a.update_layout(title_text = doc_occur_a_title,
+                              xaxis_title_text = 'Number of Documents Token Appears In',
+                              yaxis_title_text = 'Number of Tokens',
+                              bargap = 0.1)
+    return doc_occur_a
 
 # Histogram of tokens appearing in 100+ documents
-doc_occur_b = go.Figure(data = go.Histogram(x = list(docs_more.values()),
-                                       marker_color = '#d62728',
-                                       opacity = 0.75))
-doc_occur_b_title = f'Histogram of Tokens Appearing In 100+ Documents (n = {len(docs_more)})'
-doc_occur_b.update_layout(title_text = doc_occur_b_title,
-                     xaxis_title_text = 'Number of Documents Token Appears In',
-                     yaxis_title_text = 'Number of Tokens',
-                     bargap = 0.1)
+@figure('doc_occur_b', 'docs_more')
+def build_doc_occur_b(docs_more):
+    doc_occur_b = go.Figure(data = go.Histogram(x = list(docs_more.values()),
+                                           marker_color = '#d62728',
+                                           opacity = 0.75))
+    doc_occur_b_title = f'Histogram of Tokens Appearing In 100+ Documents (n = {len(docs_more)})'
+    doc_occur_b.update_layout(title_text = doc_occur_b_title,
+                         xaxis_title_text = 'Number of Documents Token Appears In',
+                         yaxis_title_text = 'Number of Tokens',
+                         bargap = 0.1)
+    return doc_occur_b
 
 # ---------------------------------------------------------------------------- #
-# HELPER FUNCTION FOR CO-OCCURRENCES
+# CO-OCCURRENCES
 # ---------------------------------------------------------------------------- #
 
-# Helper function to get co-occurrences
-def get_cooccur(topic_type_1, topic_type_2, topic_df):
-    cooccur_dict = {}
-
-    for index in range(0, len(topic_df)):
-
-        type_1 = topic_df[topic_type_1][index]
-        type_2 = topic_df[topic_type_2][index]
-
-        if type_1 not in cooccur_dict.keys():
-            cooccur_dict[type_1] = {'General': 0, 'Science': 0, 'Tech': 0,
-                                    'Politics': 0, 'Problems': 0, 'Personal': 0,
-                                    'AI': 0, 'Miscellaneous': 0, 'Healthcare': 0,
-                                    'Linguistics/Humanities': 0, 'Space': 0, 'Agriculture/Nature': 0,
-                                    'Gender/Sexuality': 0, 'Audio/Visual': 0, 'Urban Planning/Design': 0}
-        cooccur_dict[type_1][type_2] += 1
-
-    return pd.DataFrame.from_dict(cooccur_dict, orient='index')
-
 # Find co-occurrences of dominant and secondary topics
-topics_df_12 = get_cooccur('dominant_topic', 'secondary_topic', all_top_topics)
+@data('topics_df_12', 'all_lda_output')
+def build_topics_df_12(all_lda_output):
+    return cooccurrence_frame(all_lda_output, 'dominant_topic', 'secondary_topic')
 
-topics_df_13 = get_cooccur('dominant_topic', 'tertiary_topic', all_top_topics)
+@data('topics_df_13', 'all_lda_output')
+def build_topics_df_13(all_lda_output):
+    return cooccurrence_frame(all_lda_output, 'dominant_topic', 'tertiary_topic')
 
-topics_df_23 = get_cooccur('secondary_topic', 'tertiary_topic', all_top_topics)
+@data('topics_df_23', 'all_lda_output')
+def build_topics_df_23(all_lda_output):
+    return cooccurrence_frame(all_lda_output, 'secondary_topic', 'tertiary_topic')
 
 # ---------------------------------------------------------------------------- #
 # LDA TOPICS
@@ -265,65 +354,77 @@ topics_df_23 = get_cooccur('secondary_topic', 'tertiary_topic', all_top_topics)
 # ---------------------------------------------------------------------------- #
 
 # Histogram of top 3 topics
-lda_topics = go.Figure()
-lda_topics.add_trace(go.Histogram(x = all_lda_output.dominant_topic,
-                                  marker_color = '#d62728',
-                                  opacity = 0.75,
-                                  histnorm = 'probability',
-                                  name = 'Dominant Topic'))
-lda_topics.add_trace(go.Histogram(x = all_lda_output.secondary_topic,
-                                  marker_color = 'mediumblue',
-                                  opacity = 0.75,
-                                  histnorm = 'probability',
-                                  name = 'Secondary Topic'))
-lda_topics.add_trace(go.Histogram(x = all_lda_output.tertiary_topic,
-                                  opacity = 0.75,
-                                  histnorm = 'probability',
-                                  name = 'Tertiary Topic'))
-lda_topics.update_layout(title_text = 'Histogram of Dominant, Secondary, and Tertiary Topics',
-                         xaxis_title_text = '',
-                         yaxis_title_text = 'Number of Ted Talks',
-                         xaxis = dict(tickmode = 'array',
-                                      tickvals = np.arange(0,15,1),
-                                      ticktext = ['General', 'Science', 'Tech', 'Politics', 'Problems', 'Personal',
-                                                  'AI', 'Miscellaneous', 'Healthcare', 'Linguistics/Humanities', 'Space',
-                                                  'Agriculture/Nature', 'Gender/Sexuality', 'Audio/Visual', 'Urban Planning/Design'],
-                                      tickangle = -45),
-                         bargap = 0.1)
+@figure('lda_topics', 'all_lda_output')
+def build_lda_topics(all_lda_output):
+    lda_topics = go.Figure()
+    lda_topics.add_trace(go.Histogram(x = all_lda_output.dominant_topic,
+                                      marker_color = '#d62728',
+                                      opacity = 0.75,
+                                      histnorm = 'probability',
+                                      name = 'Dominant Topic'))
+    lda_topics.add_trace(go.Histogram(x = all_lda_output.secondary_topic,
+                                      marker_color = 'mediumblue',
+                                      opacity = 0.75,
+                                      histnorm = 'probability',
+                                      name = 'Secondary Topic'))
+    lda_topics.add_trace(go.Histogram(x = all_lda_output.tertiary_topic,
+                                      opacity = 0.75,
+                                      histnorm = 'probability',
+                                      name = 'Tertiary Topic'))
+    lda_topics.update_layout(title_text = 'Histogram of Dominant, Secondary, and Tertiary Topics',
+                             xaxis_title_text = '',
+                             yaxis_title_text = 'Number of Ted Talks',
+                             xaxis = dict(tickmode = 'array',
+                                          tickvals = np.arange(0,15,1),
+                                          ticktext = ['General', 'Science', 'Tech', 'Politics', 'Problems', 'Personal',
+                                                      'AI', 'Miscellaneous', 'Healthcare', 'Linguistics/Humanities', 'Space',
+                                                      'Agriculture/Nature', 'Gender/Sexuality', 'Audio/Visual', 'Urban Planning/Design'],
+                                          tickangle = -45),
+                             bargap = 0.1)
+    return lda_topics
 
 # Plot histogram of co-occurrences of dominant and secondary topics
-topic_cooc_12 = go.Figure()
-for topic in topics_df_12.index:
-    topic_cooc_12.add_trace(go.Bar(x = topics_df_12.columns,
-                                   y = topics_df_12.loc[topic],
-                                   name = topic))
-topic_cooc_12.update_layout(barmode='group', xaxis_tickangle=-45,
-                            xaxis_title_text = 'Secondary Topic',
-                            yaxis_title_text = 'Number of TED Talks',
-                            title = 'Frequency of Co-occurring Dominant and Secondary Topics')
+@figure('topic_cooc_12', 'topics_df_12')
+def build_topic_cooc_12(topics_df_12):
+    topic_cooc_12 = go.Figure()
+    for topic in topics_df_12.index:
+        topic_cooc_12.add_trace(go.Bar(x = topics_df_12.columns,
+                                       y = topics_df_12.loc[topic],
+                                       name = topic))
+    topic_cooc_12.update_layout(barmode='group', xaxis_tickangle=-45,
+                                xaxis_title_text = 'Secondary Topic',
+                                yaxis_title_text = 'Number of TED Talks',
+                                title = 'Frequency of Co-occurring Dominant and Secondary Topics')
+    return topic_cooc_12
 
 # Plot histogram of co-occurrences of dominant and tertiary topics
-topic_cooc_13 = go.Figure()
-for topic in topics_df_13.index:
-    topic_cooc_13.add_trace(go.Bar(x = topics_df_13.columns,
-                                   y = topics_df_13.loc[topic],
-                                   name = topic))
-
-# Here we modify the tickangle of the xaxis, resulting in rotated labels.
-topic_cooc_13.update_layout(barmode='group', xaxis_tickangle=-45,
-                            xaxis_title_text = 'Tertiary Topic',
-                            yaxis_title_text = 'Number of Ted Talks',
-                            title = 'Frequency of Co-occurring Dominant and Tertiary Topics')
+@figure('topic_cooc_13', 'topics_df_13')
+def build_topic_cooc_13(topics_df_13):
+    topic_cooc_13 = go.Figure()
+    for topic in topics_df_13.index:
+        topic_cooc_13.add_trace(go.Bar(x = topics_df_13.columns,
+                                       y = topics_df_13.loc[topic],
+                                       name = topic))
+
+    # Here we modify the tickangle of the xaxis, resulting in rotated labels.
+    topic_cooc_13.update_layout(barmode='group', xaxis_tickangle=-45,
+                                xaxis_title_text = 'Tertiary Topic',
+                                yaxis_title_text = 'Number of Ted Talks',
+                                title = 'Frequency of Co-occurring Dominant and Tertiary Topics')
+    return topic_cooc_13
 
 # Plot histogram of co-occurrences of dominant and tertiary topics
-topic_cooc_23 = go.Figure()
-for topic in topics_df_23.index:
-    topic_cooc_23.add_trace(go.Bar(x = topics_df_23.columns,
-                                   y = topics_df_23.loc[topic],
-                                   name = topic))
-
-# Here we modify the tickangle of the xaxis, resulting in rotated labels.
-topic_cooc_23.update_layout(barmode='group', xaxis_tickangle=-45,
-                            xaxis_title_text = 'Tertiary Topic',
-                            yaxis_title_text = 'Number of Ted Talks',
-                            title = 'Frequency of Co-occurring Secondary and Tertiary Topics')
+@figure('topic_cooc_23', 'topics_df_23')
+def build_topic_cooc_23(topics_df_23):
+    topic_cooc_23 = go.Figure()
+    for topic in topics_df_23.index:
+        topic_cooc_23.add_trace(go.Bar(x = topics_df_23.columns,
+                                       y = topics_df_23.loc[topic],
+                                       name = topic))
+
+    # Here we modify the tickangle of the xaxis, resulting in rotated labels.
+    topic_cooc_23.update_layout(barmode='group', xaxis_tickangle=-45,
+                                xaxis_title_text = 'Tertiary Topic',
+                                yaxis_title_text = 'Number of Ted Talks',
+                                title = 'Frequency of Co-occurring Secondary and Tertiary Topics')
+    return topic_cooc_23
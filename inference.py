@@ -0,0 +1,151 @@
+# ---------------------------------------------------------------------------- #
+# IMPORT PACKAGES
+# ---------------------------------------------------------------------------- #
+
+import pickle
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from recommender import get_batch_recommendations
+from tokenizer import tokenize_corpus
+from vectorizer import TokenVectorizer
+
+# ---------------------------------------------------------------------------- #
+# LOAD MODELS
+# ---------------------------------------------------------------------------- #
+
+cv_path = 'Models/final_cv.pkl'
+lda_path = 'Models/final_lda.pkl'
+
+# Loaded on first call to load_models
+models = None
+models_lock = threading.Lock()
+
+# Returns a TokenVectorizer over the saved CountVectorizer's vocabulary and the
+# saved LDA model, loading them on first use
+def load_models():
+    global models
+
+    with models_lock:
+        if models is None:
+            with open(cv_path, 'rb') as file:
+                cv = pickle.load(file)
+            with open(lda_path, 'rb') as file:
+                lda = pickle.load(file)
+            models = (TokenVectorizer.from_count_vectorizer(cv), lda)
+
+    return models
+
+# ---------------------------------------------------------------------------- #
+# LDA FOLD-IN FOR NEW TRANSCRIPTS
+# ---------------------------------------------------------------------------- #
+
+# Get topic distributions for new transcripts
+def infer_topic_distributions(texts, batch_size=50):
+    """
+    This function tokenizes new transcripts with the same tokenizer used for the
+    corpus, vectorizes them over the saved CountVectorizer's vocabulary, and folds them into the
+    saved LDA model. All transcripts go through a single vectorizer and LDA
+    transform call. It returns a len(texts) x n_topics array.
+    """
+    token_vectorizer, lda = load_models()
+
+    tokens = tokenize_corpus(texts, batch_size=batch_size)
+    dtm = token_vectorizer.transform(tokens)
+
+    return lda.transform(dtm)
+
+# Get k most similar and most different talks for new transcripts
+def recommend_texts(texts, matrix, k=10):
+    """
+    This function returns the topic distributions of the new transcripts along with
+    len(texts) x k arrays of positional indices of the most similar and most
+    different talks in matrix (the corpus document-topic matrix).
+    """
+    topics = infer_topic_distributions(texts)
+    most_sim, most_dif = get_batch_recommendations(topics, matrix, k = k)
+
+    return topics, most_sim, most_dif
+
+# ---------------------------------------------------------------------------- #
+# MICRO-BATCHING
+# ---------------------------------------------------------------------------- #
+
+class RecommendationBatcher:
+    """
+    Collects concurrent recommend requests and serves them together, so that a burst
+    of requests costs one tokenizer pipe, one vectorizer transform and one LDA
+    transform instead of one of each per request.
+
+    A batch is sent as soon as it holds max_batch requests, or max_wait seconds
+    after its first request arrived, whichever comes first.
+    """
+
+    def __init__(self, matrix, k=10, max_batch=32, max_wait=0.01):
+        self.matrix = np.asarray(matrix, dtype=float)
+        self.k = k
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+
+        self.requests = queue.Queue()
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    # Queue transcript, returning a Future of (topics, most_sim, most_dif)
+    def submit(self, text):
+        future = Future()
+        self.requests.put((text, future))
+        return future
+
+    # Get (topics, most_sim, most_dif) for one transcript, blocking until served
+    def recommend(self, text, timeout=None):
+        return self.submit(text).result(timeout)
+
+    # Stop the worker after queued requests have been served
+    def close(self):
+        self.requests.put(None)
+        self.worker.join()
+
+    def _run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+
+            # Gather more requests until the batch is full or max_wait has passed
+            batch = [request]
+            deadline = time.monotonic() + self.max_wait
+            closing = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self.requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    closing = True
+                    break
+                batch.append(request)
+
+            self._serve(batch)
+
+            if closing:
+                return
+
+    def _serve(self, batch):
+        texts = [text for text, _ in batch]
+        try:
+            topics, most_sim, most_dif = recommend_texts(texts, self.matrix, k = self.k)
+        except Exception as error:
+            for _, future in batch:
+                future.set_exception(error)
+            return
+
+        for row, (_, future) in enumerate(batch):
+            future.set_result((topics[row], most_sim[row], most_dif[row]))
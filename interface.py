@@ -4,21 +4,27 @@
 
 import streamlit as st
 
-from collections import Counter
 import numpy as np
 import pandas as pd
-import pickle
 
 # Plotting Package
 import plotly.graph_objects as go
 
 # Import custom functions
 from process_lda import show_topic_distr
-from recommender import get_rec_random, get_rec_title
+from recommender import get_rec_random, get_rec_title, load_neighbor_table, neighbor_sim_path, neighbor_diff_path
+from title_index import TitleIndex
+from topic_matrix import TopicMatrix
+from topic_words import get_topic_word_index, topic_words_sources
+from token_ranks import get_token_ranks, top_ranked, token_ranks_sources
+from year_tokens import get_year_tokens, year_tokens_sources
 
 # Import figures
 import figures
 
+# Cached artifact store
+import artifacts
+
 # ---------------------------------------------------------------------------- #
 st.title('Topic Modeling TED Talk Transcripts')
 st.subheader('Rebecca Weng | Flatiron School Data Science Immersive | Jan. 2020')
@@ -26,20 +32,27 @@ st.subheader('Rebecca Weng | Flatiron School Data Science Immersive | Jan. 2020'
 # READ IN DATA
 # ---------------------------------------------------------------------------- #
 
+# Artifacts are loaded once per process and shared across reruns and sessions
+
 # Load final dataset
-with open('Data/final_raw_data.pkl', 'rb') as file:
-    talk_df = pickle.load(file)
+talk_df = artifacts.load('Data/final_raw_data.pkl')
 
 # Load final LDA document-topic matrix
-with open('Models/final_lda_dtm.pkl', 'rb') as file:
-    final_lda_dtm = pickle.load(file)
+final_lda_dtm = artifacts.load('Models/final_lda_dtm.pkl')
+
+matrix = artifacts.derived('matrix', artifacts.source_paths('Models/final_lda_dtm.pkl'),
+                           lambda: TopicMatrix(final_lda_dtm[['01_general', '02_science', '03_technology',
+                                                             '04_politics', '05_problems', '06_personal',
+                                                             '07_AI', '08_miscellaneous', '09_healthcare',
+                                                             '10_linguistics/humanities', '11_space',
+                                                             '12_agriculture/nature', '13_gender/sexuality',
+                                                             '14_audio/visual', '15_urban_planning/design']]))
 
-matrix = final_lda_dtm[['01_general', '02_science', '03_technology',
-                        '04_politics', '05_problems', '06_personal',
-                        '07_AI', '08_miscellaneous', '09_healthcare',
-                        '10_linguistics/humanities', '11_space',
-                        '12_agriculture/nature', '13_gender/sexuality',
-                        '14_audio/visual', '15_urban_planning/design']]
+# Load precomputed most similar / most different talks (None if not built)
+neighbors = artifacts.derived('neighbors', [neighbor_sim_path, neighbor_diff_path], load_neighbor_table)
+
+# Title lookup and search
+title_index = artifacts.derived('title_index', artifacts.source_paths('Data/final_raw_data.pkl'), lambda: TitleIndex(talk_df.title))
 
 # ---------------------------------------------------------------------------- #
 # PROJECT SECTIONS
@@ -125,18 +138,16 @@ if page == 'Exploratory Data Analysis':
             max_val = st.text_input('Maximum Ranked Token (1 to 52037)', 300)
             values = st.slider("nmin to nmax", int(min_val), int(max_val), (int(min_val), int(int(max_val)/6)))
 
-            # Load in tokenized data
-            with open('Data/all_tok.pkl', 'rb') as file:
-                tok_corpus = pickle.load(file)
-
-            # Create dictionary of token counts for entire tok_corpus
-            word_bank = dict(Counter(tok_corpus))
-            top_n_corpus = sorted(word_bank, key=word_bank.get, reverse=True)[values[0]-1:values[1]-1]
+            # Tokens ranked by number of occurrences in corpus
+            token_ranks = artifacts.derived('token_ranks', token_ranks_sources,
+                                            get_token_ranks)
+            top_n_corpus, top_n_counts = top_ranked(token_ranks['corpus_vocab'], token_ranks['corpus_counts'],
+                                                    values[0], values[1])
             fig13_title = f'Top {values[0]} to {values[1]} Tokens in Corpus'
 
             # Plot top nmin to nmax tokens in corpus
             fig13 = go.Figure(data = go.Bar(x = top_n_corpus,
-                                            y = [word_bank[word] for word in top_n_corpus],
+                                            y = top_n_counts,
                                             marker_color = '#d62728',
                                             opacity = 0.75))
             fig13.update_layout(title_text = fig13_title,
@@ -154,17 +165,17 @@ if page == 'Exploratory Data Analysis':
             max_val_doc = st.text_input('Max. Ranked Token (1 to 52037)', 300)
             values_doc = st.slider("min to max", int(min_val_doc), int(max_val_doc), (int(min_val_doc), int(int(max_val_doc)/6)))
 
-            # Load in number of documents tokens appear in
-            with open('Data/doc_tok_counts.pkl', 'rb') as file:
-                doc_counts = pickle.load(file)
-
-            top_n_doc = sorted(doc_counts, key=doc_counts.get, reverse=True)[values_doc[0]-1:values_doc[1]-1]
+            # Tokens ranked by number of documents they appear in
+            token_ranks = artifacts.derived('token_ranks', token_ranks_sources,
+                                            get_token_ranks)
+            top_n_doc, top_n_doc_counts = top_ranked(token_ranks['doc_vocab'], token_ranks['doc_counts'],
+                                                     values_doc[0], values_doc[1])
             fig15_title = f'Top {values_doc[0]} to {values_doc[1]} Tokens Appearing in Most Number of Documents'
 
             # Plot top nmin to nmax tokens based on number of documents tokens
             # appeared in
             fig15 = go.Figure(data = go.Bar(x = top_n_doc,
-                                            y = [doc_counts[word] for word in top_n_doc],
+                                            y = top_n_doc_counts,
                                             marker_color = '#d62728',
                                             opacity = 0.75))
             fig15.update_layout(title_text = fig15_title,
@@ -177,12 +188,11 @@ if page == 'Exploratory Data Analysis':
     elif eda == 'Talks By Year':
         st.header('EXPLORE TED TALK TOKENS BY YEAR RECORDED')
 
-        # Load in tokens by year
-        with open('Data/year_tok.pkl', 'rb') as file:
-            tok_year_corpus = pickle.load(file)
+        # Load in year x token count matrix
+        year_tokens = artifacts.derived('year_tokens', year_tokens_sources, get_year_tokens)
 
         # Get all possible years in which TED talk was recorded
-        year_str = [str(year) for year in sorted(tok_year_corpus.keys())]
+        year_str = [str(year) for year in year_tokens.years.tolist()]
 
         # Write options for years for user to see
         st.subheader('Years Available:')
@@ -191,61 +201,55 @@ if page == 'Exploratory Data Analysis':
         st.write(', '.join(year_str[int(2*len(year_str)/4):int(3*len(year_str)/4)]))
         st.write(', '.join(year_str[int(3*len(year_str)/4):len(year_str)]))
 
-        # User inputs year of interest
+        # User inputs years of interest
         year_of_interest_a = st.text_input('Year Recorded (1)', 2019)
+        year_of_interest_b = st.text_input('Year Recorded (2)', 2018)
+
+        for year_of_interest, label in [(year_of_interest_a, '1'), (year_of_interest_b, '2')]:
+
+            # Condition if inputted year not available
+            if year_of_interest not in year_str:
+                st.write(f'Sorry, {year_of_interest} not available.')
+                continue
+
+            # Number of distinct tokens for given year
+            year_len = year_tokens.n_tokens(int(year_of_interest))
+
+            # User can toggle range of tokens to search between, then range to visualize
+            min_val_year = st.text_input(f'Minimum Ranked Token (1 to {year_len}) ({label})', 1)
+            max_val_year = st.text_input(f'Maximum Ranked Token (1 to {year_len}) ({label})', 300)
+            year_tok_range = st.slider(f'Min to Max ({label})', int(min_val_year), int(max_val_year), (1, 50))
 
-        # Condition if inputted year not available
-        if year_of_interest_a not in year_str:
-            st.write(f'Sorry, {year_of_interest_a} not available.')
-
-        # Add data for given year
-        year_data_a = tok_year_corpus[int(year_of_interest_a)]['lemma_freq']
-
-        # User can toggle range of tokens to search between, then range to visualize
-        min_val_a = st.text_input(f'Minimum Ranked Token (1 to {len(year_data_a)})', 1)
-        max_val_a = st.text_input(f'Maximum Ranked Token (1 to {len(year_data_a)})', 300)
-        year_tok_range_a = st.slider("Min to Max (1)", int(min_val_a), int(max_val_a), (1, 50))
-
-        # Sort data in range for visualization
-        year_data_sort_a = sorted(year_data_a, key = year_data_a.get, reverse = True)[year_tok_range_a[0]-1:year_tok_range_a[1]-1]
-
-        # Histogram of top tokens in talks recorded in given year
-        fig16a = go.Figure(data = go.Bar(x = year_data_sort_a,
-                                         y = [year_data_a[x] for x in year_data_sort_a]))
-        fig16a_title = f'Top {year_tok_range_a[0]} to {year_tok_range_a[1]} Tokens in Talks Recorded in {year_of_interest_a}'
-        fig16a.update_layout(title_text = fig16a_title,
-                             yaxis_title_text = 'Number of Occurrences',
-                             xaxis_tickangle = -45,
-                             bargap = 0.1)
-        st.plotly_chart(fig16a)
-
-        # # User inputs year of interest
-        # year_of_interest_b = st.text_input('Year Recorded (2)', 2019)
-        #
-        # # Condition if inputted year not available
-        # if year_of_interest_b not in year_str:
-        #     st.write(f'Sorry, {year_of_interest_b} not available.')
-        #
-        # # Add data for given year
-        # year_data_b = tok_year_corpus[int(year_of_interest_b)]['lemma_freq']
-        #
-        # # User can toggle range of tokens to search between, then range to visualize
-        # min_val_b = st.text_input(f'Minimum Ranked Token (1 to {len(year_data_b)}) (2)', 1)
-        # max_val_b = st.text_input(f'Maximum Ranked Token (1 to {len(year_data_b)}) (2)', 300)
-        # year_tok_range_b = st.slider("Min to Max (2)", int(min_val_b), int(max_val_b), (1, 50))
-        #
-        # # Sort data in range for visualization
-        # year_data_sort_b = sorted(year_data_b, key = year_data_b.get, reverse = True)[year_tok_range_b[0]-1:year_tok_range_b[1]-1]
-        #
-        # # Histogram of top tokens in talks recorded in given year
-        # fig16b = go.Figure(data = go.Bar(x = year_data_sort_b,
-        #                                  y = [year_data_b[x] for x in year_data_sort_b]))
-        # fig16b_title = f'Top {year_tok_range_b[0]} to {year_tok_range_b[1]} Tokens in Talks Recorded in {year_of_interest_b}'
-        # fig16b.update_layout(title_text = fig16b_title,
-        #                      yaxis_title_text = 'Number of Occurrences',
-        #                      xaxis_tickangle = -45,
-        #                      bargap = 0.1)
-        # st.plotly_chart(fig16b)
+            # Tokens in range, from the year's precomputed ranking
+            year_data_sort, year_data_counts = year_tokens.top_year(int(year_of_interest),
+                                                                    year_tok_range[0], year_tok_range[1])
+
+            # Histogram of top tokens in talks recorded in given year
+            fig16 = go.Figure(data = go.Bar(x = year_data_sort,
+                                            y = year_data_counts))
+            fig16_title = f'Top {year_tok_range[0]} to {year_tok_range[1]} Tokens in Talks Recorded in {year_of_interest}'
+            fig16.update_layout(title_text = fig16_title,
+                                yaxis_title_text = 'Number of Occurrences',
+                                xaxis_tickangle = -45,
+                                bargap = 0.1)
+            st.plotly_chart(fig16)
+
+        # Compare the two years
+        if year_of_interest_a in year_str and year_of_interest_b in year_str and year_of_interest_a != year_of_interest_b:
+            st.subheader(f'{year_of_interest_a} vs. {year_of_interest_b}')
+
+            for year_x, year_y in [(year_of_interest_a, year_of_interest_b), (year_of_interest_b, year_of_interest_a)]:
+
+                # Tokens used more often (per 1,000 tokens) in year_x than in year_y
+                diff_tokens, diff_scores = year_tokens.top_diff(int(year_x), int(year_y), 1, 31)
+
+                fig17 = go.Figure(data = go.Bar(x = diff_tokens,
+                                                y = diff_scores))
+                fig17.update_layout(title_text = f'Tokens Used More in {year_x} Than in {year_y}',
+                                    yaxis_title_text = 'Difference in Occurrences per 1,000 Tokens',
+                                    xaxis_tickangle = -45,
+                                    bargap = 0.1)
+                st.plotly_chart(fig17)
 
 if page == 'Topic Modeling':
 
@@ -262,14 +266,31 @@ if page == 'Topic Modeling':
         st.markdown('* Evaluate using log-likelihood and perplexity, but most important for this project was human-readability')
 
         st.header('LDA TOPICS')
-        st.markdown('* These are the top 15 words in each topic that my final model generated')
+        st.markdown('* These are the top words in each topic that my final model generated (15 by default)')
         st.markdown('* The leftmost column shows the labels I assigned the topics')
 
-        # Load in data on final LDA model
-        with open('Models/final_lda_words.pkl', 'rb') as file:
-            top_15_words = pickle.load(file)
+        # Load in ranked words of final LDA model
+        topic_word_index = artifacts.derived('topic_words', topic_words_sources, get_topic_word_index)
+
+        n_top_words = st.slider('Number of Top Words', 5, 50, 15)
+        st.write(topic_word_index.top_words_frame(n_top_words)) # top n words in topics
 
-        st.write(top_15_words) # top 15 words in topics
+        # Topics in which a given word is most likely
+        topic_word = st.text_input('Look Up Word', 'brain')
+        word_topic_names, word_topic_weights = topic_word_index.word_topics(topic_word.strip().lower())
+
+        if not word_topic_names:
+            st.write(f'Sorry, {topic_word} is not in the model vocabulary.')
+        else:
+            word_topics = go.Figure(data = go.Bar(x = word_topic_names,
+                                                  y = word_topic_weights,
+                                                  marker_color = '#d62728',
+                                                  opacity = 0.75))
+            word_topics.update_layout(title_text = f'Topics Weighting "{topic_word.strip().lower()}" Most',
+                                      yaxis_title_text = 'Probability of Word in Topic',
+                                      xaxis_tickangle = -45,
+                                      bargap = 0.1)
+            st.plotly_chart(word_topics)
 
         # st.markdown('[CLICK HERE FOR SEPARATE VISUAL!](file:///Users/rweng/Desktop/Flatiron/Projects/Final_20190124/final_lda.html)', unsafe_html = True)
         st.header('MOST PREVALENT TOPICS')
@@ -298,16 +319,20 @@ if page == 'TED Talk Recommender':
     st.markdown('* This serves as both an application and evaluation metric of the LDA topic modeling')
     st.markdown('* The Jensen-Shannon divergence determines how different two probability distributions are, based on the Kullback-Leibler divergence')
     st.markdown('* The recommender takes in the document-topic matrix generated by the LDA model, determines the Jensen-Shannon divergence between the talk of interest and all the talks, then sorts it, and returns the most simiilar and most dissimilar talks')
-    st.markdown('* The dropdown bar also allows you to type so if a word is in the title, it will come up!')
+    st.markdown('* Type the start of any words in the title into the search box to narrow down the dropdown!')
 
     if rec == 'By Title':
-        title = st.selectbox('Talk Title', tuple(talk_df.title))
+        # Only the top 20 titles matching the search are sent to the dropdown
+        search = st.text_input('Search Talk Titles', '')
+        matches = title_index.search(search, 20)
+        title = st.selectbox('Talk Title', tuple(title_index.titles[match] for match in matches))
 
-        if title not in list(talk_df.title):
+        if title is None or title_index.lookup(title) is None:
             st.write('TALK NOT FOUND')
 
         else:
-            index, topic_distr, summ, tags, most_sim, most_dif = get_rec_title(matrix, final_lda_dtm, talk_df, title, 5)
+            index, topic_distr, summ, tags, most_sim, most_dif = get_rec_title(matrix, final_lda_dtm, talk_df, title, 5,
+                                                                               neighbors, title_index)
             st.plotly_chart(topic_distr)
             st.subheader('SUMMARY:')
             st.write(summ)
@@ -336,7 +361,7 @@ if page == 'TED Talk Recommender':
                 st.write(talk_df.iloc[talk]['summ'])
 
     elif rec == 'Random':
-        index, rand_topic_distr, summ, tags, most_sim, most_dif = get_rec_random(matrix, final_lda_dtm, talk_df, 5)
+        index, rand_topic_distr, summ, tags, most_sim, most_dif = get_rec_random(matrix, final_lda_dtm, talk_df, 5, neighbors)
         st.plotly_chart(rand_topic_distr)
         st.subheader('SUMMARY:')
         st.write(summ)
@@ -0,0 +1,238 @@
+# ---------------------------------------------------------------------------- #
+# IMPORT PACKAGES
+# ---------------------------------------------------------------------------- #
+
+import hashlib
+import itertools
+import json
+from multiprocessing import Pool
+import os
+import pickle
+import resource
+import sys
+import time
+
+import numpy as np
+from scipy.sparse import load_npz, save_npz
+from sklearn.decomposition import LatentDirichletAllocation
+
+from columnar import file_checksum, manifest_path
+from inference import cv_path
+from process_lda import topic_top_words
+from token_corpus import get_token_corpus, token_corpus_path
+from tokenize_stream import count_completed
+from vectorizer import TokenVectorizer
+
+# ---------------------------------------------------------------------------- #
+# CACHED DOCUMENT-TERM MATRIX
+# ---------------------------------------------------------------------------- #
+
+sweep_dir = 'Models/sweep'
+
+# Checksums of the files the document-term matrix is built from
+def source_checksums():
+    sources = [cv_path, manifest_path(token_corpus_path), 'Data/final_tok.pkl']
+    return {path: file_checksum(path) for path in sources if os.path.exists(path)}
+
+# Short digest of source_checksums, identifying the data a run was trained on
+def data_digest(checksums):
+    return hashlib.sha256(json.dumps(checksums, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+# Vectorize the token corpus over the saved vocabulary, reusing the cached matrix
+def get_sweep_dtm(directory=sweep_dir):
+    """
+    This function returns the document-term matrix of the token corpus over the
+    saved CountVectorizer's vocabulary, and that vocabulary. The matrix is saved
+    in directory and reused until the vectorizer or token corpus changes.
+    """
+    dtm_file = os.path.join(directory, 'dtm.npz')
+    meta_file = os.path.join(directory, 'dtm.json')
+    checksums = source_checksums()
+
+    with open(cv_path, 'rb') as file:
+        cv = pickle.load(file)
+    vocab = sorted(cv.vocabulary_, key=cv.vocabulary_.get)
+
+    if os.path.exists(dtm_file) and os.path.exists(meta_file):
+        with open(meta_file) as file:
+            if json.load(file) == checksums:
+                return load_npz(dtm_file), vocab
+
+    dtm = TokenVectorizer.from_count_vectorizer(cv).transform(get_token_corpus())
+    os.makedirs(directory, exist_ok=True)
+    save_npz(dtm_file, dtm)
+    with open(meta_file, 'w') as file:
+        json.dump(checksums, file, indent=2)
+
+    print(f'Vectorized {dtm.shape[0]} documents over {dtm.shape[1]} terms')
+    return dtm, vocab
+
+# Split documents into training and held-out sets
+def split_documents(n_docs, test_size=0.1, seed=0):
+    order = np.random.RandomState(seed).permutation(n_docs)
+    n_test = int(round(n_docs * test_size))
+    return np.sort(order[n_test:]), np.sort(order[:n_test])
+
+# ---------------------------------------------------------------------------- #
+# SWEEP
+# ---------------------------------------------------------------------------- #
+
+# Every combination of grid values, as a list of parameter dictionaries
+def expand_grid(grid):
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*[grid[name] for name in names])]
+
+# Identifier of a run, used to skip runs already in the results file; data is
+# the data_digest of the corpus, so runs on an older corpus are trained again
+def run_key(params, max_iter, seed, test_size, data):
+    return json.dumps({'params': params, 'max_iter': max_iter, 'seed': seed, 'test_size': test_size,
+                       'data': data}, sort_keys=True)
+
+# File name of a run's saved model
+def model_file_name(key):
+    return 'lda_' + hashlib.sha256(key.encode('utf-8')).hexdigest()[:12] + '.pkl'
+
+# Data used by pool workers, and the worker's peak memory once it is loaded,
+# set once per worker by set_worker_data
+worker_data = None
+worker_baseline_mb = None
+
+def set_worker_data(directory, test_size, seed):
+    global worker_data, worker_baseline_mb
+    dtm = load_npz(os.path.join(directory, 'dtm.npz')).tocsr()
+    train, test = split_documents(dtm.shape[0], test_size, seed)
+    worker_data = (dtm[train], dtm[test])
+    worker_baseline_mb = peak_rss_mb()
+
+# Peak resident memory of this process in MB (for a forked worker, this starts
+# from the parent's resident memory at the fork)
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3 # bytes on macOS, KB elsewhere
+
+# Train one model and measure it
+def run_lda(params, vocab, max_iter, seed, n_top_words, save_path=None):
+    """
+    This function trains an online LDA model (as used for final_lda.pkl) with
+    params on the training documents, and returns its held-out perplexity,
+    training and held-out log-likelihood, training wall time, memory and the
+    topic_top_words table. Memory is reported as peak_rss_mb, the peak resident
+    memory of the worker process (including what it inherited from the parent
+    and the loaded data), and train_rss_mb, how far training raised that peak.
+    """
+    train, test = worker_data
+    lda = LatentDirichletAllocation(learning_method='online', max_iter=max_iter,
+                                    random_state=seed, **params)
+
+    start = time.perf_counter()
+    lda.fit(train)
+    wall_time = time.perf_counter() - start
+
+    result = {'params': params, 'max_iter': max_iter, 'seed': seed,
+              'perplexity': float(lda.perplexity(test)),
+              'log_likelihood': float(lda.score(train)),
+              'test_log_likelihood': float(lda.score(test)),
+              'wall_time': wall_time, 'peak_rss_mb': peak_rss_mb(),
+              'train_rss_mb': peak_rss_mb() - worker_baseline_mb,
+              'top_words': topic_top_words(lda, vocab, n_top_words).values.tolist()}
+
+    if save_path is not None:
+        with open(save_path, 'wb') as file:
+            pickle.dump(lda, file)
+        result['model_file'] = os.path.basename(save_path)
+
+    return result
+
+# Run a (run key, run_lda arguments) task, labelling its result with the key
+def run_lda_task(task):
+    key, arguments = task
+    return {'key': key, **run_lda(*arguments)}
+
+# Completed runs in a results file
+def read_results(path):
+    count_completed(path) # drops a partially written last line
+    if not os.path.exists(path):
+        return []
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+# Train models over a grid of hyperparameters
+def run_sweep(grid, directory=sweep_dir, n_jobs=1, max_iter=10, test_size=0.1, seed=0,
+              n_top_words=15, save_models=False):
+    """
+    This function trains an LDA model for every combination of values in grid
+    (LatentDirichletAllocation parameter name -> list of values, e.g.
+    n_components, learning_decay, doc_topic_prior, topic_word_prior) across
+    n_jobs processes, on a document-term matrix vectorized once and cached in
+    directory. Every run gets a fresh worker process, so the increase in peak
+    memory during training is the run's own. Each result is appended to
+    directory/results.jsonl as soon as its run finishes, and runs already in
+    that file are skipped, so an interrupted sweep resumes where it stopped.
+    Runs are keyed by the data too: once the vectorizer or token corpus changes,
+    every run is trained again. Saved models are named from the run key. It
+    returns the results in the file for the current data.
+    """
+    _, vocab = get_sweep_dtm(directory)
+    data = data_digest(source_checksums())
+    results_path = os.path.join(directory, 'results.jsonl')
+
+    done = {result['key'] for result in read_results(results_path)}
+    tasks = []
+    for params in expand_grid(grid):
+        key = run_key(params, max_iter, seed, test_size, data)
+        save_path = os.path.join(directory, model_file_name(key)) if save_models else None
+        if key not in done:
+            tasks.append((key, (params, vocab, max_iter, seed, n_top_words, save_path)))
+    print(f'{len(tasks)} runs to train ({len(expand_grid(grid)) - len(tasks)} already done)')
+
+    with open(results_path, 'a') as results_file:
+
+        # Write each result as one line, flushed, so a crash loses at most the runs in progress
+        def record(result):
+            results_file.write(json.dumps(result) + '\n')
+            results_file.flush()
+            print(f'{result["params"]}: perplexity {result["perplexity"]:.1f}, '
+                  f'log-likelihood {result["log_likelihood"]:.0f}, {result["wall_time"]:.1f}s')
+
+        with Pool(n_jobs, initializer=set_worker_data, initargs=(directory, test_size, seed),
+                  maxtasksperchild=1) as pool:
+            for result in pool.imap_unordered(run_lda_task, tasks):
+                record(result)
+
+    return [result for result in read_results(results_path) if json.loads(result['key']).get('data') == data]
+
+# ---------------------------------------------------------------------------- #
+# RUN SWEEP
+# ---------------------------------------------------------------------------- #
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Train LDA models over a grid of hyperparameters on the '
+                                                 'token corpus, resuming an interrupted sweep.')
+    parser.add_argument('--n-components', type=int, nargs='+', default=[10, 15, 20])
+    parser.add_argument('--learning-decay', type=float, nargs='+', default=[0.7])
+    parser.add_argument('--doc-topic-prior', type=float, nargs='+', default=None,
+                        help='alpha values (default: 1 / n_components)')
+    parser.add_argument('--topic-word-prior', type=float, nargs='+', default=None,
+                        help='eta values (default: 1 / n_components)')
+    parser.add_argument('--max-iter', type=int, default=10)
+    parser.add_argument('--n-jobs', type=int, default=1)
+    parser.add_argument('--output-dir', default=sweep_dir)
+    parser.add_argument('--save-models', action='store_true', help='pickle every trained model')
+    args = parser.parse_args()
+
+    grid = {'n_components': args.n_components, 'learning_decay': args.learning_decay}
+    if args.doc_topic_prior is not None:
+        grid['doc_topic_prior'] = args.doc_topic_prior
+    if args.topic_word_prior is not None:
+        grid['topic_word_prior'] = args.topic_word_prior
+
+    results = run_sweep(grid, directory=args.output_dir, n_jobs=args.n_jobs,
+                        max_iter=args.max_iter, save_models=args.save_models)
+
+    # Summary, best held-out perplexity first
+    for result in sorted(results, key=lambda result: result['perplexity']):
+        print(f'{result["params"]}: perplexity {result["perplexity"]:.1f}, '
+              f'log-likelihood {result["log_likelihood"]:.0f}, {result["wall_time"]:.1f}s, '
+              f'{result["train_rss_mb"]:.0f} MB')
@@ -7,20 +7,30 @@ import pandas as pd
 import plotly.offline as py
 import plotly.graph_objects as go
 
+from dtm_builder import build_dtm
+
 # ---------------------------------------------------------------------------- #
 # FUNCTIONS FOR PROCESSING AND PRESENTING LDA
 # ---------------------------------------------------------------------------- #
 
 # Returns dataframe of top n words in an LDA model
-# given feature names from vectorizer
+# given feature names from vectorizer. Only the top n words of each topic are
+# selected (argpartition) and sorted, so the cost grows with n, not the
+# vocabulary size (see topic_words.TopicWordIndex for the saved model's words)
 def topic_top_words(model, feature_names, n):
-    topic_word_dict = {}
-
-    for topic_idx, topic in enumerate(model.components_):
+    components = model.components_
+    n = min(n, components.shape[1])
 
-        topic_word_dict['Topic ' + str(topic_idx + 1)] = [feature_names[i] for i in topic.argsort()[:-n - 1:-1]]
+    if n < components.shape[1]:
+        top = np.argpartition(-components, n - 1, axis=1)[:, :n]
+    else:
+        top = np.broadcast_to(np.arange(components.shape[1]), components.shape)
+    order = np.lexsort((top, -np.take_along_axis(components, top, axis=1)), axis=1)
+    top = np.take_along_axis(top, order, axis=1)
 
-    return pd.DataFrame.from_dict(topic_word_dict, orient='index', columns = range(1, n + 1))
+    return pd.DataFrame(np.asarray(feature_names, dtype=object)[top],
+                        index=['Topic ' + str(topic_idx + 1) for topic_idx in range(len(components))],
+                        columns=range(1, n + 1))
 
 # Figure of topic distribution for given index
 def show_topic_distr(talk_df, lda_dtm, index):
@@ -49,31 +59,21 @@ def show_topic_distr(talk_df, lda_dtm, index):
 
 # Return document topic matrix of topic model
 def print_dtm(topic_model, dtm):
-    # Create Document - Topic Matrix
-    output = topic_model.transform(dtm)
-
-    # column names
-    topicnames = ["Topic" + str(i) for i in range(topic_model.n_components)]
+    """
+    This function returns the document-topic matrix of dtm as a DataFrame with
+    one column per topic (Topic0, Topic1, ...), the dominant, secondary and
+    tertiary topic of each document (int64), and documents labelled Doc0, Doc1, ...
+    It is built by dtm_builder.build_dtm, which can also stream large corpora to
+    a memory-mapped artifact.
+    """
+    df_document_topic = build_dtm(topic_model, dtm)
+
+    # build_dtm stores ranks in the smallest integer type that fits; print_dtm keeps int64
+    rank_names = df_document_topic.columns[topic_model.n_components:]
+    df_document_topic[rank_names] = df_document_topic[rank_names].astype(np.int64)
 
     # index names
-    docnames = ["Doc" + str(i) for i in range(dtm.shape[0])]
-
-    # Make the pandas dataframe
-    df_document_topic = pd.DataFrame(output, columns=topicnames, index=docnames)
-
-    # Get dominant topic for each document
-    dominant_topic = np.argmax(df_document_topic.values, axis=1)
-
-    # Get next dominant topic for each document
-    sorted_topics = np.argsort(df_document_topic.values, axis = 1)
-    secondary_topic = [doc[-2] for doc in sorted_topics]
-
-    # Get third dominant topic for each document
-    tertiary_topic = [doc[-3] for doc in sorted_topics]
-
-    df_document_topic['dominant_topic'] = dominant_topic
-    df_document_topic['secondary_topic'] = secondary_topic
-    df_document_topic['tertiary_topic'] = tertiary_topic
+    df_document_topic.index = ["Doc" + str(i) for i in range(dtm.shape[0])]
 
     return df_document_topic
 
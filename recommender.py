@@ -2,9 +2,13 @@
 # IMPORT PACKAGES
 # ---------------------------------------------------------------------------- #
 
+import os
+
 import numpy as np
 from scipy.stats import entropy
+from scipy.special import xlogy
 from process_lda import show_topic_distr
+from topic_matrix import TopicMatrix
 import random
 
 # ---------------------------------------------------------------------------- #
@@ -42,13 +46,256 @@ def get_most_diff_documents(query,matrix,k=10):
     sims = jensen_shannon(query,matrix) # list of jensen shannon distances
     return sims.argsort()[-k-1:-1] # the top k positional index of the largest Jensen Shannon distances
 
+# Get k smallest keys in O(N)
+def select_k_smallest(keys, k):
+    """
+    This function returns the positional indices of the k smallest values in keys,
+    sorted by value. Ties (including ties at the k-th value) are broken by
+    lower index, so the result is deterministic.
+    """
+    k = min(k, len(keys))
+    if k <= 0:
+        return np.array([], dtype=int)
+
+    # k-th smallest value via partial selection instead of a full sort
+    kth = np.partition(keys, k - 1)[k - 1]
+    below = np.flatnonzero(keys < kth)
+    ties = np.flatnonzero(keys == kth)[:k - len(below)]
+    selected = np.concatenate([below, ties])
+
+    return selected[np.lexsort((selected, keys[selected]))]
+
+# Get k most similar and k most different documents in one pass
+def get_most_similar_and_diff_documents(query, matrix, k=10, exclude=None):
+    """
+    This function computes the Jensen-Shannon distances between the query
+    and the corpus once, and returns the positional indices of the k smallest
+    distances (most similar first) and the k largest distances (most different first).
+    The positional index (or indices) in exclude, usually the query talk itself,
+    are never returned. matrix may be a TopicMatrix, which computes the distances
+    faster in float32.
+    """
+    if isinstance(matrix, TopicMatrix):
+        sims = matrix.jensen_shannon(query)
+    else:
+        sims = np.asarray(jensen_shannon(query, matrix), dtype=float) # list of jensen shannon distances
+
+    return select_similar_and_diff(sims, k, exclude)
+
+# Select k most similar and k most different documents from a distance vector
+def select_similar_and_diff(sims, k, exclude=None):
+    """
+    This function returns the positional indices of the k smallest and the k largest
+    distances in sims, never returning the positional index (or indices) in exclude.
+    """
+    sim_keys = sims.copy()
+    diff_keys = -sims
+
+    if exclude is not None:
+        exclude = np.unique(np.atleast_1d(exclude))
+        sim_keys[exclude] = np.inf
+        diff_keys[exclude] = np.inf
+        k = min(k, len(sims) - len(exclude))
+
+    return select_k_smallest(sim_keys, k), select_k_smallest(diff_keys, k)
+
+# ---------------------------------------------------------------------------- #
+# BATCH RECOMMENDATIONS
+# ---------------------------------------------------------------------------- #
+
+# Calculate Jensen-Shannon distances for a block of queries, in chunks
+def jensen_shannon_chunks(queries, matrix, max_bytes=256 * 1024 * 1024):
+    """
+    This function computes the Jensen-Shannon distance between every row of queries
+    (a Q x K block of topic distributions) and every row of matrix (N x K).
+    Queries are processed in chunks sized so that the temporary chunk x N x K arrays
+    stay under max_bytes. It yields (start, distances) pairs, where distances is a
+    chunk x N array for queries[start:start + chunk].
+    """
+    queries = np.asarray(queries, dtype=float)
+    matrix = np.asarray(matrix, dtype=float)
+
+    # Normalize rows, as scipy.stats.entropy does
+    queries = queries / queries.sum(axis=1, keepdims=True)
+    matrix = matrix / matrix.sum(axis=1, keepdims=True)
+
+    # JS = H(m) - (H(p) + H(q)) / 2, so sum(q log q) is computed once per corpus
+    matrix_terms = xlogy(matrix, matrix).sum(axis=1)
+    query_terms = xlogy(queries, queries).sum(axis=1)
+
+    # Mixture and its x log x are the two chunk x N x K temporaries
+    row_bytes = 2 * matrix.size * matrix.itemsize
+    chunk = max(1, int(max_bytes // row_bytes))
+
+    for start in range(0, len(queries), chunk):
+        mixture = 0.5 * (queries[start:start + chunk, None, :] + matrix[None, :, :])
+        mixture_terms = xlogy(mixture, mixture).sum(axis=2)
+        divergence = 0.5 * (query_terms[start:start + chunk, None] + matrix_terms[None, :]) - mixture_terms
+        yield start, np.sqrt(np.maximum(divergence, 0))
+
+# Get k most similar and k most different documents for a block of queries
+def get_batch_recommendations(queries, matrix, k=10, exclude=None, max_bytes=256 * 1024 * 1024):
+    """
+    This function returns two Q x k arrays with the positional indices of the
+    k most similar and k most different documents for every row of queries.
+    exclude optionally gives, for every query, the positional index of a document
+    to leave out (usually the query talk itself), or -1 to exclude nothing.
+    """
+    queries = np.asarray(queries, dtype=float)
+    n_queries, n_docs = len(queries), len(matrix)
+    if exclude is not None:
+        k = min(k, n_docs - 1)
+    k = min(k, n_docs)
+
+    most_sim = np.empty((n_queries, k), dtype=int)
+    most_dif = np.empty((n_queries, k), dtype=int)
+
+    for start, sims in jensen_shannon_chunks(queries, matrix, max_bytes):
+        for offset, row in enumerate(sims):
+            index = start + offset
+            row_exclude = None
+            if exclude is not None and exclude[index] >= 0:
+                row_exclude = exclude[index]
+            most_sim[index], most_dif[index] = select_similar_and_diff(row, k, row_exclude)
+
+    return most_sim, most_dif
+
+# ---------------------------------------------------------------------------- #
+# PRECOMPUTED NEIGHBOR TABLE
+# ---------------------------------------------------------------------------- #
+
+neighbor_sim_path = 'Models/neighbors_sim.npy'
+neighbor_diff_path = 'Models/neighbors_diff.npy'
+
+# Save an array as .npy through a temporary file in the same directory, so that
+# processes with the old file memory-mapped keep reading it intact
+def save_array(path, array):
+    with open(path + '.tmp', 'wb') as file:
+        np.save(file, array)
+    os.replace(path + '.tmp', path)
+
+# Build table of k most similar and k most different talks for every talk
+def build_neighbor_table(matrix, k=20, sim_path=neighbor_sim_path, diff_path=neighbor_diff_path):
+    """
+    This function computes, for every talk in the document-topic matrix,
+    the positional indices of its k most similar and k most different talks
+    and saves them as two N x k integer arrays (.npy) that can be memory-mapped.
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    n_docs = len(matrix)
+    k = min(k, n_docs - 1)
+
+    # Smallest integer type that can hold every positional index
+    dtype = np.min_scalar_type(n_docs - 1)
+    most_sim, most_dif = get_batch_recommendations(matrix, matrix, k = k, exclude = np.arange(n_docs))
+    most_sim = most_sim.astype(dtype)
+    most_dif = most_dif.astype(dtype)
+
+    save_array(sim_path, most_sim)
+    save_array(diff_path, most_dif)
+
+    return most_sim, most_dif
+
+# Jensen-Shannon distance between aligned rows of p and q
+def paired_jensen_shannon(p, q):
+    """
+    This function returns the Jensen-Shannon distance between p[..., :] and
+    q[..., :] for every leading index, where p and q broadcast against each other
+    (e.g. N x 1 x K queries against N x k x K neighbors gives N x k distances).
+    """
+    p = p / p.sum(axis=-1, keepdims=True)
+    q = q / q.sum(axis=-1, keepdims=True)
+    m = 0.5 * (p + q)
+    divergence = 0.5 * (xlogy(p, p).sum(axis=-1) + xlogy(q, q).sum(axis=-1)) - xlogy(m, m).sum(axis=-1)
+    return np.sqrt(np.maximum(divergence, 0))
+
+# Add newly appended talks to the neighbor table
+def patch_neighbor_table(matrix, n_old, sim_path=neighbor_sim_path, diff_path=neighbor_diff_path):
+    """
+    This function updates the neighbor table saved by build_neighbor_table after
+    talks n_old onward have been appended to the document-topic matrix, without
+    recomputing all N x N distances. New talks get their k most similar and most
+    different talks from a batch query. Each existing talk only compares its
+    stored neighbors with the new talks, which gives the same top k as a full
+    rebuild. Ties go to the lower index, as in select_k_smallest.
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    n_docs = len(matrix)
+    table_sim, table_dif = np.load(sim_path), np.load(diff_path)
+    if len(table_sim) != n_old:
+        raise ValueError(f'Neighbor table has {len(table_sim)} rows, expected {n_old}')
+
+    k = table_sim.shape[1]
+    new = np.arange(n_old, n_docs)
+    dtype = np.min_scalar_type(n_docs - 1)
+
+    # Neighbors of the new talks
+    new_sim, new_dif = get_batch_recommendations(matrix[n_old:], matrix, k = k, exclude = new)
+
+    # Distances from every existing talk to every new talk
+    to_new = np.empty((n_old, len(new)))
+    for start, sims in jensen_shannon_chunks(matrix[n_old:], matrix[:n_old]):
+        to_new[:, start:start + len(sims)] = sims.T
+
+    patched = []
+    for table, new_rows, sign in [(table_sim, new_sim, 1), (table_dif, new_dif, -1)]:
+        table = table.astype(np.int64)
+
+        # Stored neighbors and new talks, ranked by distance (negated for most different)
+        current = paired_jensen_shannon(matrix[:n_old, None, :], matrix[table])
+        ids = np.concatenate([table, np.broadcast_to(new, (n_old, len(new)))], axis=1)
+        keys = sign * np.concatenate([current, to_new], axis=1)
+        order = np.lexsort((ids, keys), axis=1)[:, :k]
+
+        patched.append(np.concatenate([np.take_along_axis(ids, order, axis=1), new_rows]).astype(dtype))
+
+    most_sim, most_dif = patched
+    save_array(sim_path, most_sim)
+    save_array(diff_path, most_dif)
+
+    return most_sim, most_dif
+
+# Load memory-mapped neighbor table
+def load_neighbor_table(sim_path=neighbor_sim_path, diff_path=neighbor_diff_path):
+    """
+    This function memory-maps the neighbor table saved by build_neighbor_table.
+    It returns None if the table has not been built.
+    """
+    try:
+        return np.load(sim_path, mmap_mode='r'), np.load(diff_path, mmap_mode='r')
+    except FileNotFoundError:
+        return None
+
+# Get n most similar and most different talks for talk at index
+def get_recommendations(matrix, index, n, neighbors=None):
+    """
+    This function looks up the n most similar and most different talks in the
+    precomputed neighbor table (O(n)), and falls back to computing Jensen-Shannon
+    distances against the whole corpus when there is no table, the table was built
+    for a different corpus, or n is larger than the number of stored neighbors.
+    The fallback is fastest when matrix is a TopicMatrix built once and reused
+    (as the app does through its artifact store); building one costs more than
+    the single query it would speed up, so other matrices are queried as they are.
+    """
+    if neighbors is not None:
+        table_sim, table_dif = neighbors
+        if len(table_sim) == len(matrix) and n <= table_sim.shape[1]:
+            return np.asarray(table_sim[index, :n], dtype=int), np.asarray(table_dif[index, :n], dtype=int)
+
+    # Rows of a DataFrame are positional, not labels
+    if not isinstance(matrix, TopicMatrix):
+        matrix = np.asarray(matrix, dtype=float)
+    return get_most_similar_and_diff_documents(matrix[index], matrix, k = n, exclude = index)
+
+# ---------------------------------------------------------------------------- #
+# RECOMMENDATIONS
+# ---------------------------------------------------------------------------- #
+
 # Get n most similar and most different talks for random talk
-def get_rec_random(matrix, all_lda_output, final_data, n):
+def get_rec_random(matrix, all_lda_output, final_data, n, neighbors=None):
 
     # Get random index
-    index = random.randint(0, len(all_lda_output))
-
-    query = matrix.iloc[index]
+    index = random.randint(0, len(all_lda_output) - 1)
 
     print('Getting recommendations for talk #' + str(index))
 
@@ -58,24 +305,28 @@ def get_rec_random(matrix, all_lda_output, final_data, n):
     # rand_topic_distr.show()
 
     # Get most similar and most different talks based on jensen-shannon distance
-    most_sim = get_most_similar_documents(query, matrix, k = n)
-    most_dif = get_most_diff_documents(query, matrix, k = n)
+    most_sim, most_dif = get_recommendations(matrix, index, n, neighbors)
 
     return index, rand_topic_distr, summ, tags, most_sim, most_dif
 
 # Get n most similar and most different talks for random talk
-def get_rec_title(matrix, all_lda_output, final_data, title, n):
+def get_rec_title(matrix, all_lda_output, final_data, title, n, neighbors=None, title_index=None):
+
+    # Find index of first TED talk whose title matches, using the prebuilt
+    # title index if there is one
+    if title_index is not None:
+        index = title_index.lookup(title)
+    elif title in set(final_data.title):
+        index = final_data[final_data.title == title].index.tolist()[0]
+    else:
+        index = None
 
     # Check if title exists in title
-    if title not in list(final_data.title):
+    if index is None:
         return 'No talk found.'
 
     else:
 
-        # Find index of first TED talk whose title matches
-        index = final_data[final_data.title == title].index.tolist()[0]
-        query = matrix.iloc[index]
-
         print('Getting recommendations for talk #' + str(index))
 
         # Get figure showing topic distribution for talk in question
@@ -84,7 +335,26 @@ def get_rec_title(matrix, all_lda_output, final_data, title, n):
         # rand_topic_distr.show()
 
         # Get most similar and most different talks based on jensen-shannon distance
-        most_sim = get_most_similar_documents(query, matrix, k = n)
-        most_dif = get_most_diff_documents(query, matrix, k = n)
+        most_sim, most_dif = get_recommendations(matrix, index, n, neighbors)
 
         return index, topic_distr, summ, tags, most_sim, most_dif
+
+# ---------------------------------------------------------------------------- #
+# BUILD NEIGHBOR TABLE
+# ---------------------------------------------------------------------------- #
+
+if __name__ == '__main__':
+    import argparse
+    import pickle
+
+    parser = argparse.ArgumentParser(description='Precompute the most similar and most different '
+                                                 'talks for every talk in Models/final_lda_dtm.pkl.')
+    parser.add_argument('--k', type=int, default=20, help='number of neighbors to store per talk')
+    args = parser.parse_args()
+
+    # Load final LDA document-topic matrix
+    with open('Models/final_lda_dtm.pkl', 'rb') as file:
+        final_lda_dtm = pickle.load(file)
+
+    # First 15 columns are the topic proportions
+    build_neighbor_table(final_lda_dtm.iloc[:, :15], k = args.k)
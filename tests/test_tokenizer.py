@@ -0,0 +1,42 @@
+import pytest
+
+from tokenizer import clean_transcript, legacy_clean_transcript
+
+# Representative transcript passages: stage directions, quotes, dashes, music
+# notes, ellipses, numbers with commas and hyphens, and missing spaces after
+# punctuation
+transcripts = [
+    "Thank you so much, Chris. It's truly a great honor to have the opportunity to come to this "
+    "stage twice; I'm extremely grateful. (Applause) I have been blown away by this conference.",
+    "So I said, \"Well, why not?\" And she said, “Because it’s 2,000 miles away.” (Laughter) "
+    "And that was that.",
+    "We spent 18-hour days in the lab... and by the 3rd-year mark we had 40,000 samples.And then, "
+    "everything changed.",
+    "♫ I wanna go home ♫ (Music) It's a twentieth-century idea — the R and D department, or R & D — "
+    "and post-modernism is no exception.",
+    "In 1998, the company had 250 employees; now it has 12,500.What happened? Well.... let me explain…",
+    "(Applause.)So, here's the thing: 5th-graders can do it, 2nd-graders can't.",
+]
+
+# Intended differences from legacy_clean_transcript, as
+# (text, legacy output, clean_transcript output)
+differences = [
+    # Every comma group of a number is removed; legacy re-used the matched text
+    # as a pattern and only removed the first
+    ('It was 1,000,000 people', 'it was 1000,000 people', 'it was 1000000 people'),
+    # Nested phrases are removed whole; legacy stopped at the first ")"
+    ('(a (b) c) d', '. a . b. c. d', 'd'),
+    ('x (a (b) c y', 'x . a . b. c y', 'x a c y'),
+    # Parentheses without a partner are dropped and the text around them kept
+    ('x ( y', 'x ( y', 'x y'),
+    ('a) b', 'a) b', 'a b'),
+]
+
+@pytest.mark.parametrize('text', transcripts)
+def test_clean_transcript_matches_legacy(text):
+    assert clean_transcript(text) == legacy_clean_transcript(text)
+
+@pytest.mark.parametrize('text, legacy, expected', differences)
+def test_clean_transcript_intended_differences(text, legacy, expected):
+    assert legacy_clean_transcript(text) == legacy
+    assert clean_transcript(text) == expected
@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from recommender import get_recommendations, jensen_shannon
+from topic_matrix import TopicMatrix
+
+# float32 storage of the matrix and mixtures keeps distances within this of the
+# float64 scipy-based reference
+tolerance = 1e-3
+
+# Random topic distributions, with some topics exactly zero
+def random_matrix(n_docs=2000, n_topics=15, seed=0):
+    random_state = np.random.RandomState(seed)
+    matrix = random_state.dirichlet(np.full(n_topics, 0.1), size=n_docs)
+    matrix[random_state.rand(n_docs, n_topics) < 0.2] = 0
+    matrix[:, 0] += 1e-6 # keep every row non-empty
+    return matrix / matrix.sum(axis=1, keepdims=True)
+
+def final_matrix():
+    from columnar import load_columnar_or_pickle
+    return np.asarray(load_columnar_or_pickle('Models/final_lda_dtm.pkl').iloc[:, :15], dtype=float)
+
+has_final_matrix = os.path.exists('Models/final_lda_dtm.pkl') or os.path.exists('Models/final_lda_dtm/manifest.json')
+
+def max_error(matrix, n_queries=200):
+    topic_matrix = TopicMatrix(matrix)
+    queries = np.random.RandomState(1).choice(len(matrix), min(n_queries, len(matrix)), replace=False)
+    return max(np.abs(topic_matrix.jensen_shannon(matrix[index]) - jensen_shannon(matrix[index], matrix)).max()
+               for index in queries)
+
+def test_jensen_shannon_within_tolerance_random():
+    assert max_error(random_matrix()) < tolerance
+
+@pytest.mark.skipif(not has_final_matrix, reason='final LDA document-topic matrix not available')
+def test_jensen_shannon_within_tolerance_final_matrix():
+    assert max_error(final_matrix()) < tolerance
+
+def test_jensen_shannon_of_row_with_itself_is_zero():
+    matrix = random_matrix(n_docs=50)
+    distances = TopicMatrix(matrix).jensen_shannon(matrix[7])
+    assert distances[7] == pytest.approx(0, abs=tolerance)
+
+def test_recommendations_match_plain_matrix():
+    matrix = random_matrix(n_docs=500)
+    topic_matrix = TopicMatrix(matrix)
+    for index in [0, 123, 499]:
+        most_sim, most_dif = get_recommendations(topic_matrix, index, 10)
+        reference_sim, reference_dif = get_recommendations(matrix, index, 10)
+        assert index not in most_sim
+        np.testing.assert_array_equal(most_sim, reference_sim)
+        np.testing.assert_array_equal(most_dif, reference_dif)
+
+def test_recommendations_from_dataframe():
+    matrix = random_matrix(n_docs=500)
+    frame = pd.DataFrame(matrix, columns=['Topic' + str(topic) for topic in range(matrix.shape[1])],
+                         index=['Doc' + str(doc) for doc in range(len(matrix))])
+
+    # Without a neighbor table, and with n larger than the stored neighbors
+    table = (np.zeros((500, 3), dtype=int), np.zeros((500, 3), dtype=int))
+    for neighbors in [None, table]:
+        most_sim, most_dif = get_recommendations(frame, 5, 5, neighbors)
+        reference_sim, reference_dif = get_recommendations(matrix, 5, 5)
+        np.testing.assert_array_equal(most_sim, reference_sim)
+        np.testing.assert_array_equal(most_dif, reference_dif)
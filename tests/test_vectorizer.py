@@ -0,0 +1,47 @@
+import os
+import pickle
+import warnings
+
+import numpy as np
+import pytest
+
+from columnar import load_columnar_or_pickle
+from tokenizer import get_new_transcript
+from vectorizer import TokenVectorizer
+
+cv_path = 'Models/final_cv.pkl'
+
+pytestmark = pytest.mark.skipif(not os.path.exists(cv_path), reason='saved CountVectorizer not available')
+
+@pytest.fixture(scope='module')
+def cv():
+    with open(cv_path, 'rb') as file, warnings.catch_warnings():
+        warnings.simplefilter('ignore') # pickled with an older scikit-learn
+        return pickle.load(file)
+
+# Random documents drawn from tokens seen in the corpus (many of them outside
+# the vocabulary), plus tokens the analyzer drops, lowercases or splits
+@pytest.fixture(scope='module')
+def token_docs():
+    corpus_tokens = sorted(load_columnar_or_pickle('Data/doc_tok_counts.pkl'))
+    odd_tokens = ['a', 'I', 'Brain', 'WORLD', 'e-mail', 'well-being', 'u.s.', 'brain ', ' world',
+                  'new york', "don't", '3d', '42', '', 'naïve', 'café']
+
+    random_state = np.random.RandomState(0)
+    tokens = np.array(corpus_tokens + odd_tokens, dtype=object)
+    docs = [tokens[random_state.randint(len(tokens), size=random_state.randint(0, 400))].tolist()
+            for _ in range(300)]
+    return docs + [[], odd_tokens]
+
+def test_transform_equals_count_vectorizer(cv, token_docs):
+    expected = cv.transform([get_new_transcript(tokens) for tokens in token_docs])
+    dtm = TokenVectorizer.from_count_vectorizer(cv).transform(token_docs)
+
+    assert dtm.shape == expected.shape
+    assert dtm.dtype == expected.dtype
+    assert (dtm != expected).nnz == 0
+
+def test_transform_is_repeatable(cv, token_docs):
+    vectorizer = TokenVectorizer.from_count_vectorizer(cv)
+    first = vectorizer.transform(token_docs[:100])
+    assert (vectorizer.transform(token_docs[:100]) != first).nnz == 0
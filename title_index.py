@@ -0,0 +1,78 @@
+# ---------------------------------------------------------------------------- #
+# IMPORT PACKAGES
+# ---------------------------------------------------------------------------- #
+
+import heapq
+import re
+from bisect import bisect_left
+from itertools import islice
+
+# ---------------------------------------------------------------------------- #
+# TITLE INDEX
+# ---------------------------------------------------------------------------- #
+
+# Lowercase alphanumeric words in a title or search query
+word_pattern = re.compile(r'[a-z0-9]+')
+
+def title_words(text):
+    return word_pattern.findall(text.lower())
+
+class TitleIndex:
+    """
+    Exact and typeahead lookup of talk titles.
+
+    lookup maps a title to the positional index of the first talk with that title
+    (so duplicate titles always resolve to the same, lowest index), and search
+    returns incremental matches for a partially typed query using a sorted
+    vocabulary of title words with a posting list of talks per word.
+    """
+
+    def __init__(self, titles):
+        self.titles = list(titles)
+
+        # Exact title -> first positional index
+        self.index_of = {}
+        for index, title in enumerate(self.titles):
+            self.index_of.setdefault(title, index)
+
+        # Word -> sorted positional indices of talks whose title contains it
+        # (duplicate titles are only indexed once, under their first index)
+        postings = {}
+        for title, index in self.index_of.items():
+            for word in set(title_words(title)):
+                postings.setdefault(word, []).append(index)
+
+        self.words = sorted(postings)
+        self.postings = [postings[word] for word in self.words]
+
+    # Positional index of talk with exact title, or None if not found
+    def lookup(self, title):
+        return self.index_of.get(title)
+
+    # Talks whose title contains a word starting with prefix
+    def _prefix_matches(self, prefix):
+        matches = set()
+        position = bisect_left(self.words, prefix)
+        while position < len(self.words) and self.words[position].startswith(prefix):
+            matches.update(self.postings[position])
+            position += 1
+        return matches
+
+    # Get positional indices of up to n talks matching a partially typed query
+    def search(self, query, n=20):
+        """
+        Every word in query must be a prefix of some word in the title. Titles that
+        start with the query are ranked first, then titles are ordered by index.
+        An empty query returns the first n titles.
+        """
+        words = title_words(query)
+        if not words:
+            return list(islice(self.index_of.values(), n))
+
+        # Intersect matches for each query word, rarest word first
+        word_matches = sorted((self._prefix_matches(word) for word in words), key=len)
+        matches = set.intersection(*word_matches)
+
+        query = query.strip().lower()
+        return heapq.nsmallest(n, matches, key=lambda index: (not self.titles[index].lower().startswith(query),
+                                                              index))
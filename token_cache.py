@@ -0,0 +1,188 @@
+# ---------------------------------------------------------------------------- #
+# IMPORT PACKAGES
+# ---------------------------------------------------------------------------- #
+
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+
+import spacy
+
+import tokenizer
+from token_corpus import TokenCorpus, token_corpus_path
+
+# ---------------------------------------------------------------------------- #
+# TOKENIZER FINGERPRINT
+# ---------------------------------------------------------------------------- #
+
+# Functions of tokenizer.py whose code decides the tokens, hashed by source so
+# that editing one (e.g. a replacement callback of the cleaning engine) changes
+# the fingerprint
+token_functions = [tokenizer.clean_transcript,
+                   tokenizer._replace_ellipses,
+                   tokenizer.remove_parentheticals,
+                   tokenizer._replace_punctuation_numbers,
+                   tokenizer.resolve_lemma,
+                   tokenizer.lemmatize_doc,
+                   tokenizer.spacy_tokenizer]
+
+# Hash of everything that changes the output of spacy_tokenizer: the stop word
+# list, the cleaning rules and the code that applies them, the lemmatized parts
+# of speech, the version of the spaCy model, and the lemma table's fingerprint
+# (nltk version and WordNet corpus). Cached tokens are only valid for the same
+# fingerprint.
+@functools.lru_cache(maxsize=None)
+def tokenizer_fingerprint():
+    model_version = spacy.util.get_package_version('en_core_web_sm')
+
+    config = [sorted(tokenizer.stop_words),
+              tokenizer.punctuations,
+              tokenizer.ellipses.pattern,
+              tokenizer.parentheses_newlines.pattern,
+              tokenizer.punctuation_numbers.pattern,
+              sorted(tokenizer.char_table.items(), key=lambda item: item[0]),
+              tokenizer.research_development.pattern,
+              sorted(tokenizer.wordnet_pos.items()),
+              sorted(tokenizer.unused_components),
+              [inspect.getsource(function) for function in token_functions],
+              'en_core_web_sm', str(model_version),
+              tokenizer.lemma_fingerprint()]
+
+    return hashlib.sha256(repr(config).encode('utf-8')).hexdigest()
+
+# ---------------------------------------------------------------------------- #
+# TOKENIZATION CACHE
+# ---------------------------------------------------------------------------- #
+
+class TokenCache:
+    """
+    On-disk cache of tokenized transcripts, one pickle per transcript named by
+    a hash of the raw transcript text. The cache directory records the
+    tokenizer fingerprint it was built with and is cleared when it changes
+    (e.g. when the stop word list in tokenizer.py is edited).
+    Once the cache exceeds max_bytes, least recently used entries are evicted
+    until it is down to low_water (a fraction of max_bytes), so the directory is
+    listed and sorted once per batch of evictions rather than on every insert.
+    """
+
+    def __init__(self, path='Data/tok_cache', max_bytes=512 * 1024 * 1024, low_water=0.9):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.low_water_bytes = int(low_water * max_bytes)
+        self.fingerprint = tokenizer_fingerprint()
+
+        os.makedirs(path, exist_ok=True)
+
+        # Clear cache if it was built with a different tokenizer configuration
+        fingerprint_file = os.path.join(path, 'fingerprint')
+        if os.path.exists(fingerprint_file):
+            with open(fingerprint_file, 'r') as file:
+                if file.read().strip() != self.fingerprint:
+                    self.clear()
+        with open(fingerprint_file, 'w') as file:
+            file.write(self.fingerprint)
+
+        self.total_bytes = sum(entry.stat().st_size for entry in self._entries())
+
+    # Cache entries currently on disk
+    def _entries(self):
+        return [entry for entry in os.scandir(self.path) if entry.name.endswith('.pkl')]
+
+    def _file(self, text):
+        key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, key + '.pkl')
+
+    # Returns cached tokens for a transcript, or None if not cached
+    def get(self, text):
+        file_name = self._file(text)
+        try:
+            with open(file_name, 'rb') as file:
+                tokens = pickle.load(file)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+        # Mark as recently used
+        os.utime(file_name)
+        return tokens
+
+    # Stores tokens for a transcript, evicting old entries if over max_bytes
+    def put(self, text, tokens):
+        file_name = self._file(text)
+        temp_name = file_name + '.tmp'
+
+        # Write to a temporary file first so a crash never leaves a partial entry
+        with open(temp_name, 'wb') as file:
+            pickle.dump(tokens, file, protocol=pickle.HIGHEST_PROTOCOL)
+        if os.path.exists(file_name):
+            self.total_bytes -= os.path.getsize(file_name)
+        os.replace(temp_name, file_name)
+        self.total_bytes += os.path.getsize(file_name)
+
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    # Removes least recently used entries until the cache is down to its low-water mark
+    def evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        for entry in entries:
+            if self.total_bytes <= self.low_water_bytes:
+                break
+            self.total_bytes -= entry.stat().st_size
+            os.remove(entry.path)
+
+    # Removes every entry
+    def clear(self):
+        for entry in self._entries():
+            os.remove(entry.path)
+        self.total_bytes = 0
+
+# ---------------------------------------------------------------------------- #
+# INCREMENTAL TOKENIZATION
+# ---------------------------------------------------------------------------- #
+
+# Tokenizes transcripts, only running spaCy on transcripts that are new or
+# changed since they were last cached. Returns one list of tokens per transcript.
+def tokenize_cached(texts, cache=None, batch_size=50, n_process=1):
+    if cache is None:
+        cache = TokenCache()
+
+    texts = list(texts)
+    tok_doc = [cache.get(text) for text in texts]
+
+    # Tokenize only cache misses, once per distinct transcript
+    missing = {}
+    for index, tokens in enumerate(tok_doc):
+        if tokens is None:
+            missing.setdefault(texts[index], []).append(index)
+    new_tokens = tokenizer.tokenize_corpus(missing.keys(), batch_size=batch_size,
+                                           n_process=n_process)
+
+    for (text, indices), tokens in zip(missing.items(), new_tokens):
+        cache.put(text, tokens)
+        for index in indices:
+            tok_doc[index] = tokens
+
+    print(f'Tokenized {len(missing)} of {len(texts)} transcripts ({len(texts) - len(missing)} cached)')
+
+    return tok_doc
+
+# Rebuilds Data/final_tok.pkl (tokens per transcript), Data/all_tok.pkl
+# (flat list of every token in the corpus) and the integer-encoded token corpus
+# (Data/token_corpus) from raw transcripts
+def rebuild_token_files(texts, cache=None, batch_size=50, n_process=1,
+                        doc_path='Data/final_tok.pkl', corpus_path='Data/all_tok.pkl',
+                        encoded_path=token_corpus_path):
+    tok_doc = tokenize_cached(texts, cache=cache, batch_size=batch_size, n_process=n_process)
+    tok_corpus = [token for tokens in tok_doc for token in tokens]
+
+    with open(doc_path, 'wb') as file:
+        pickle.dump(tok_doc, file)
+
+    with open(corpus_path, 'wb') as file:
+        pickle.dump(tok_corpus, file)
+
+    TokenCorpus.from_documents(tok_doc).save(encoded_path)
+
+    return tok_doc, tok_corpus
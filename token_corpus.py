@@ -0,0 +1,138 @@
+# ---------------------------------------------------------------------------- #
+# IMPORT PACKAGES
+# ---------------------------------------------------------------------------- #
+
+from collections.abc import Sequence
+import pickle
+
+import numpy as np
+
+from columnar import ArtifactWriter, get_strings, load_arrays, read_manifest
+
+# ---------------------------------------------------------------------------- #
+# INTEGER-ENCODED TOKEN CORPUS
+# ---------------------------------------------------------------------------- #
+
+token_corpus_path = 'Data/token_corpus'
+
+class TokenCorpus(Sequence):
+    """
+    Tokenized corpus stored in CSR form: vocab is the list of distinct tokens, ids
+    the uint32 vocabulary index of every token in the corpus, and offsets the
+    int64 start of each document in ids (document i is
+    ids[offsets[i]:offsets[i + 1]]).
+
+    A TokenCorpus can be used in place of the list of per-document token lists
+    (Data/final_tok.pkl): indexing or iterating it gives lists of token strings.
+    Corpus statistics are computed from the id arrays without building strings.
+    """
+
+    def __init__(self, vocab, ids, offsets):
+        self.vocab = list(vocab)
+        self.ids = ids
+        self.offsets = offsets
+        self._distinct = None
+
+    # Encode lists of tokens, numbering tokens in order of first appearance
+    @classmethod
+    def from_documents(cls, tok_docs):
+        tok_docs = list(tok_docs)
+        index = {}
+
+        offsets = np.zeros(len(tok_docs) + 1, dtype=np.int64)
+        np.cumsum([len(tokens) for tokens in tok_docs], out=offsets[1:])
+        ids = np.fromiter((index.setdefault(token, len(index)) for tokens in tok_docs for token in tokens),
+                          dtype=np.uint32, count=offsets[-1])
+
+        return cls(index.keys(), ids, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        vocab = self.vocab
+        return [vocab[token_id] for token_id in self.ids[self.offsets[index]:self.offsets[index + 1]].tolist()]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    # Flat list of every token in the corpus (Data/all_tok.pkl)
+    def tokens(self):
+        vocab = self.vocab
+        return [vocab[token_id] for token_id in self.ids.tolist()]
+
+    # Document index of every token
+    def doc_ids(self):
+        return np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.offsets))
+
+    # Number of tokens in each document
+    def doc_lengths(self):
+        return np.diff(self.offsets)
+
+    # Number of times each vocabulary token appears in the corpus
+    def term_counts(self):
+        return np.bincount(self.ids, minlength=len(self.vocab))
+
+    # Distinct (document, token id) pairs, sorted by document then token id
+    def distinct_pairs(self):
+        if self._distinct is None:
+            keys = np.sort(self.doc_ids() * len(self.vocab) + self.ids)
+            keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+            self._distinct = np.divmod(keys, len(self.vocab))
+        return self._distinct
+
+    # Number of documents each vocabulary token appears in
+    def document_frequency(self):
+        return np.bincount(self.distinct_pairs()[1], minlength=len(self.vocab))
+
+    # Number of distinct tokens in each document
+    def distinct_counts(self):
+        return np.bincount(self.distinct_pairs()[0], minlength=len(self))
+
+    # Token -> count dictionary of a per-token statistic, in vocabulary order
+    def count_dict(self, counts):
+        return dict(zip(self.vocab, counts.tolist()))
+
+    # Save as a columnar artifact (see columnar.py)
+    def save(self, directory=token_corpus_path):
+        writer = ArtifactWriter(directory, 'token_corpus')
+        writer.strings('vocab', self.vocab)
+        writer.array('ids', self.ids)
+        writer.array('offsets', self.offsets)
+        writer.close()
+
+    # Load a saved token corpus, memory-mapping the id arrays
+    @classmethod
+    def load(cls, directory=token_corpus_path):
+        manifest = read_manifest(directory)
+        if manifest['kind'] != 'token_corpus':
+            raise ValueError(f'{directory} is not a token corpus')
+
+        arrays = load_arrays(directory, manifest)
+        return cls(get_strings(arrays, 'vocab'), arrays['ids'], arrays['offsets'])
+
+# Load the token corpus, encoding the per-document token pickle (without saving)
+# if it has not been built
+def get_token_corpus(path=token_corpus_path, doc_path='Data/final_tok.pkl'):
+    try:
+        return TokenCorpus.load(path)
+    except FileNotFoundError:
+        with open(doc_path, 'rb') as file:
+            return TokenCorpus.from_documents(pickle.load(file))
+
+# ---------------------------------------------------------------------------- #
+# BUILD TOKEN CORPUS
+# ---------------------------------------------------------------------------- #
+
+if __name__ == '__main__':
+
+    # Load in tokens per document
+    with open('Data/final_tok.pkl', 'rb') as file:
+        tok_doc = pickle.load(file)
+
+    TokenCorpus.from_documents(tok_doc).save()
@@ -0,0 +1,86 @@
+# ---------------------------------------------------------------------------- #
+# IMPORT PACKAGES
+# ---------------------------------------------------------------------------- #
+
+import pickle
+
+import numpy as np
+
+from columnar import manifest_path
+from token_corpus import get_token_corpus, token_corpus_path
+
+# ---------------------------------------------------------------------------- #
+# RANKED TOKEN FREQUENCIES
+# ---------------------------------------------------------------------------- #
+
+token_ranks_path = 'Data/token_ranks.npz'
+
+# Files the rankings are built from
+token_ranks_sources = [token_ranks_path, manifest_path(token_corpus_path),
+                       'Data/final_tok.pkl', 'Data/doc_tok_counts.pkl']
+
+# Rank tokens by count
+def rank_counts(counts):
+    """
+    This function takes a dictionary of token -> count and returns two arrays,
+    the tokens and their counts, ordered from most to least frequent. Ties keep
+    dictionary order, exactly as sorted(counts, key=counts.get, reverse=True) does.
+    """
+    vocab = np.array(list(counts.keys()), dtype=str)
+    values = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+    order = np.argsort(-values, kind='stable')
+
+    return vocab[order], values[order]
+
+# Build ranked token frequency arrays for the EDA pages
+def build_token_ranks(token_corpus, doc_counts, path=token_ranks_path):
+    """
+    This function ranks tokens by number of occurrences in the corpus (token_corpus,
+    a TokenCorpus) and by number of documents they appear in
+    (doc_counts, token -> number of documents), and saves both rankings so that
+    the top nmin to nmax tokens are a slice of an array.
+    """
+    corpus_vocab, corpus_counts = rank_counts(token_corpus.count_dict(token_corpus.term_counts()))
+    doc_vocab, doc_doc_counts = rank_counts(doc_counts)
+
+    token_ranks = {'corpus_vocab': corpus_vocab, 'corpus_counts': corpus_counts,
+                   'doc_vocab': doc_vocab, 'doc_counts': doc_doc_counts}
+
+    if path is not None:
+        np.savez(path, **token_ranks)
+
+    return token_ranks
+
+# Load ranked token frequency arrays
+def load_token_ranks(path=token_ranks_path):
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+# Load ranked token frequency arrays, building them from the token corpus
+# (without saving) if they have not been built
+def get_token_ranks(path=token_ranks_path):
+    try:
+        return load_token_ranks(path)
+    except FileNotFoundError:
+        with open('Data/doc_tok_counts.pkl', 'rb') as file:
+            doc_counts = pickle.load(file)
+        return build_token_ranks(get_token_corpus(), doc_counts, path=None)
+
+# Top nmin to nmax tokens (1-indexed ranks, as used by the EDA sliders)
+def top_ranked(vocab, counts, nmin, nmax):
+    return vocab[nmin - 1:nmax - 1].tolist(), counts[nmin - 1:nmax - 1].tolist()
+
+# ---------------------------------------------------------------------------- #
+# BUILD RANKED TOKEN FREQUENCIES
+# ---------------------------------------------------------------------------- #
+
+if __name__ == '__main__':
+
+    # Load in corpus of tokens
+    token_corpus = get_token_corpus()
+
+    # Load in number of documents tokens appear in
+    with open('Data/doc_tok_counts.pkl', 'rb') as file:
+        doc_counts = pickle.load(file)
+
+    build_token_ranks(token_corpus, doc_counts)
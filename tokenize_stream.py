@@ -0,0 +1,111 @@
+# ---------------------------------------------------------------------------- #
+# IMPORT PACKAGES
+# ---------------------------------------------------------------------------- #
+
+import argparse
+import csv
+import json
+import os
+import sys
+from collections import deque
+from itertools import islice
+
+import tokenizer
+
+# ---------------------------------------------------------------------------- #
+# READING AND WRITING RECORDS
+# ---------------------------------------------------------------------------- #
+
+# Streams records from a CSV or JSONL file one at a time as dictionaries
+def read_records(path, file_format=None):
+    if file_format is None:
+        file_format = 'csv' if path.endswith('.csv') else 'jsonl'
+
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        if file_format == 'csv':
+            # Transcripts are longer than the default csv field size limit
+            csv.field_size_limit(sys.maxsize)
+            for record in csv.DictReader(file):
+                yield record
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+# Counts records already written to the output file, truncating a partially
+# written last line left behind by a crash
+def count_completed(path):
+    if not os.path.exists(path):
+        return 0
+
+    completed = 0
+    last_newline = 0
+    position = 0
+    with open(path, 'rb') as file:
+        for line in file:
+            position += len(line)
+            if line.endswith(b'\n'):
+                completed += 1
+                last_newline = position
+
+    if last_newline != position:
+        with open(path, 'r+b') as file:
+            file.truncate(last_newline)
+
+    return completed
+
+# ---------------------------------------------------------------------------- #
+# STREAMING TOKENIZATION
+# ---------------------------------------------------------------------------- #
+
+# Tokenizes transcripts from input_path and appends one JSON line per record,
+# {id_field: ..., "tokens": [...]}, to output_path as soon as it is finished.
+# Records already in output_path are skipped, so an interrupted run resumes
+# from the last completed record. Memory use does not grow with corpus size.
+def tokenize_stream(input_path, output_path, text_field='transcript', id_field=None,
+                    file_format=None, batch_size=50, n_process=1):
+
+    completed = count_completed(output_path)
+    records = islice(read_records(input_path, file_format), completed, None)
+
+    # IDs of records sent to spaCy but not yet written, in input order
+    pending = deque()
+
+    def texts():
+        for number, record in enumerate(records, start=completed):
+            pending.append(record[id_field] if id_field else number)
+            yield record.get(text_field) or ''
+
+    written = 0
+    with open(output_path, 'a', encoding='utf-8') as file:
+        for tokens in tokenizer.iter_tokenize_corpus(texts(), batch_size=batch_size,
+                                                     n_process=n_process):
+            record_id = pending.popleft()
+            file.write(json.dumps({id_field or 'index': record_id, 'tokens': tokens}) + '\n')
+            file.flush()
+            written += 1
+
+    print(f'Tokenized {written} records ({completed} already completed)')
+
+    return completed + written
+
+# ---------------------------------------------------------------------------- #
+# COMMAND LINE
+# ---------------------------------------------------------------------------- #
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stream transcripts from a CSV or JSONL file '
+                                                 'through spacy_tokenizer and write tokens as JSONL.')
+    parser.add_argument('input', help='CSV or JSONL file of transcripts')
+    parser.add_argument('output', help='JSONL file to append tokens to (resumed if it exists)')
+    parser.add_argument('--text-field', default='transcript', help='field holding the transcript text')
+    parser.add_argument('--id-field', default=None, help='field copied to the output to identify records '
+                                                         '(defaults to the record number)')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default=None,
+                        help='input format (inferred from the file extension by default)')
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--n-process', type=int, default=1)
+    args = parser.parse_args()
+
+    tokenize_stream(args.input, args.output, text_field=args.text_field, id_field=args.id_field,
+                    file_format=args.format, batch_size=args.batch_size, n_process=args.n_process)
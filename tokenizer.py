@@ -2,18 +2,15 @@
 # IMPORT PACKAGES
 # --------------------------------------------------------------------------- #
 
-import numpy as np
-import pandas as pd
-
-import nltk
-from nltk.corpus import wordnet
-# nltk.download('wordnet')
-from nltk.stem import WordNetLemmatizer
+import functools
+import hashlib
+import inspect
+import os
+import pickle
 import re
 import string
 import spacy
 from spacy.lang.en.stop_words import STOP_WORDS
-from spacy.lang.en import English
 
 # --------------------------------------------------------------------------- #
 # HELPER FUNCTIONS
@@ -100,31 +97,9 @@ def handle_parentheses(text):
 
     return ' '.join(text.split())
 
-# --------------------------------------------------------------------------- #
-# STOP WORDS & PUNCTUATION
-# --------------------------------------------------------------------------- #
-
-# Create our list of punctuation marks
-punctuations = string.punctuation
-
-# Create our list of stopwords
-nlp = spacy.load('en_core_web_sm')
-stop_words = spacy.lang.en.stop_words.STOP_WORDS
-
-stop_words = list(stop_words)
-stop_words.extend(['yeah', 'ya', 'ah', 'um', 'oh', 'actually', 'literally', 'like', 's', 'applause'])
-
-# --------------------------------------------------------------------------- #
-# INITIALIZE WORD NET LEMMATIZER
-# --------------------------------------------------------------------------- #
-
-lemmatizer = WordNetLemmatizer()
-
-# --------------------------------------------------------------------------- #
-# TOKENIZATION FUNCTION
-# --------------------------------------------------------------------------- #
-
-def spacy_tokenizer(text):
+# Original step-by-step cleaning, kept as the reference implementation that
+# clean_transcript is checked against
+def legacy_clean_transcript(text):
 
     # Remove .., ..., ....
     no_ellipses = text.replace('....', '').replace('...', '').replace('..','').replace('…', '')
@@ -155,35 +130,327 @@ def spacy_tokenizer(text):
     cleantext = ' '.join(no_spec.split())
     cleantext = cleantext.strip()
 
-    # Lemmatize here
-    # Creating our token object, which is used to create documents with linguistic annotations.
-    # we disabled the parser and ner parts of the pipeline in order to speed up parsing
-    mytokens = nlp(cleantext.lower(), disable=['parser', 'ner'])
+    return cleantext.lower()
+
+# --------------------------------------------------------------------------- #
+# CLEANING ENGINE
+# --------------------------------------------------------------------------- #
+
+# Pass 1: ellipses
+# (runs of 2+ periods are removed four, three, then two at a time, so a run
+# whose length leaves a remainder of one keeps a single period)
+ellipses = re.compile(r'(?P<dots>\.{2,})|(?P<ellipsis>…)')
+
+# Pass 2: parenthetical phrases
+parentheses_newlines = re.compile(r'[()\n]')
+
+# Pass 3: missing spaces after punctuation and number formatting
+punctuation_numbers = re.compile(r'(?P<punc>[.!?,;])(?=[A-Za-z]{2})'
+                                 r'|(?P<hyphen>[0-9]+(?:,[0-9]{3})*-)'
+                                 r'|(?P<place>(?:1st|2nd|3rd|[0-9]th))-'
+                                 r'|(?P<comma>(?<=[0-9]),(?=[0-9]{3}))')
+
+# Pass 4: quotation marks, dashes and music notes
+char_table = str.maketrans({'"': ' ', '”': ' ', '’': None,
+                            '–': ' ', '—': ' ', '-': None,
+                            '♪': None, '♫': None})
+
+# Pass 5: specific rules
+research_development = re.compile(r'R (?:and|&) D')
+
+def _replace_ellipses(match):
+    if match.lastgroup == 'dots':
+        return '.' if len(match.group()) % 4 == 1 else ''
+    return ''
+
+# Replaces parenthetical phrases with a space in one pass over the parentheses.
+# Nested phrases are removed whole with the phrase around them. A parenthesis
+# without a partner on its line is replaced by a space and the text around it
+# is kept, since where the phrase was meant to end is unknown.
+def remove_parentheticals(text):
+    spans = []  # (start, end) of every matched pair
+    strays = [] # positions of unmatched parentheses
+    opens = []  # positions of parentheses not yet closed
+
+    for match in parentheses_newlines.finditer(text):
+        char, position = match.group(), match.start()
+        if char == '(':
+            opens.append(position)
+        elif char == ')' and opens:
+            spans.append((opens.pop(), position + 1))
+        elif char == ')':
+            strays.append(position)
+        else:
+            strays.extend(opens)
+            opens = []
+    strays.extend(opens)
+
+    # Cut in order, skipping phrases and strays inside a phrase already cut
+    cuts = sorted(spans + [(position, position + 1) for position in strays])
+    pieces = []
+    copied = 0
+    for start, end in cuts:
+        if start >= copied:
+            pieces.extend([text[copied:start], ' '])
+            copied = end
+    pieces.append(text[copied:])
+
+    return ''.join(pieces)
+
+def _replace_punctuation_numbers(match):
+    group = match.lastgroup
+    if group == 'punc':
+        return match.group('punc') + ' '
+    if group == 'hyphen':
+        return '# '
+    if group == 'place':
+        return match.group('place') + ' '
+    return ''
+
+# Cleans raw transcript text before it is passed to spaCy. Each stage is a
+# single precompiled linear pass over the text, replacing the per-match
+# re.sub calls and str.replace chain in legacy_clean_transcript.
+def clean_transcript(text):
+
+    # Remove ellipses and parenthetical phrases
+    text = ellipses.sub(_replace_ellipses, text)
+    text = remove_parentheticals(text)
+
+    # Add missing spaces after punctuation and handle numbers
+    text = punctuation_numbers.sub(_replace_punctuation_numbers, text)
+
+    # Remove quotation marks, dashes and music notes
+    text = text.translate(char_table)
+
+    # SPECIFIC RULE
+    text = research_development.sub('research and development', text)
+
+    # Replace all whitespace with one space
+    return ' '.join(text.split()).lower()
+
+# --------------------------------------------------------------------------- #
+# STOP WORDS & PUNCTUATION
+# --------------------------------------------------------------------------- #
+
+# Create our list of punctuation marks
+punctuations = string.punctuation
+
+# Create our list of stopwords
+stop_words = STOP_WORDS
+
+stop_words = list(stop_words)
+stop_words.extend(['yeah', 'ya', 'ah', 'um', 'oh', 'actually', 'literally', 'like', 's', 'applause'])
+stop_word_set = set(stop_words)
+
+# --------------------------------------------------------------------------- #
+# SPACY PIPELINE
+# --------------------------------------------------------------------------- #
+
+# Components of en_core_web_sm that are never used. They are disabled when the
+# model is loaded, so they are never deserialized.
+unused_components = ['parser', 'ner']
+
+# Loaded on first call to get_nlp, so importing this module (e.g. for
+# get_new_transcript or the stop word list) does not load the model
+nlp = None
+
+# Returns the spaCy pipeline, loading it on first use
+def get_nlp():
+    global nlp
+
+    if nlp is None:
+        nlp = spacy.load('en_core_web_sm', disable=unused_components)
+
+    return nlp
+
+# --------------------------------------------------------------------------- #
+# INITIALIZE WORD NET LEMMATIZER
+# --------------------------------------------------------------------------- #
+
+# Loaded on first call to get_lemmatizer. Importing nltk is slow and, with the
+# lemma table, WordNet is only needed for (text, part of speech) pairs that
+# have not been seen before.
+lemmatizer = None
+
+# Returns the WordNet lemmatizer, importing nltk on first use
+def get_lemmatizer():
+    global lemmatizer
+
+    if lemmatizer is None:
+        # nltk.download('wordnet')
+        from nltk.stem import WordNetLemmatizer
+        lemmatizer = WordNetLemmatizer()
+
+    return lemmatizer
+
+# Sentinel for pairs not yet in the lemma table
+missing = object()
+
+# --------------------------------------------------------------------------- #
+# LEMMA LOOKUP TABLE
+# --------------------------------------------------------------------------- #
 
-    # Lemmatizing each token and converting each token into lowercase
+lemma_table_path = 'Data/lemma_table.pkl'
+
+# WordNet part of speech for each spaCy part of speech that is lemmatized
+# (the values of wordnet.NOUN, wordnet.VERB, wordnet.ADV and wordnet.ADJ,
+# written out so that importing this module does not load the WordNet corpus)
+wordnet_pos = {'NOUN': 'n', 'VERB': 'v', 'ADV': 'r', 'ADJ': 'a'}
+
+# Maps (token text, spaCy part of speech) to the final lemma, or to None if
+# the token is dropped (other part of speech, stop word or punctuation).
+# Loaded from lemma_table_path on first use.
+lemma_table = None
+
+# Version of nltk and checksum of the WordNet corpus used by the lemmatizer
+def wordnet_version():
+    """
+    This function returns the installed nltk version and a sha256 of the files of
+    the WordNet corpus it would load ('missing' if the corpus is not installed).
+    """
+    import nltk
+    import nltk.data
+
+    try:
+        corpus = nltk.data.find('corpora/wordnet')
+    except LookupError:
+        try:
+            corpus = nltk.data.find('corpora/wordnet.zip')
+        except LookupError:
+            return nltk.__version__, 'missing'
+
+    corpus = str(corpus)
+    if os.path.isdir(corpus):
+        paths = sorted(os.path.join(root, name) for root, _, names in os.walk(corpus) for name in names)
+    else:
+        paths = [corpus]
+
+    checksum = hashlib.sha256()
+    for path in paths:
+        checksum.update(os.path.relpath(path, corpus).encode('utf-8'))
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                checksum.update(chunk)
+
+    return nltk.__version__, checksum.hexdigest()
+
+# Hash of everything that decides the lemma of a (text, part of speech) pair:
+# the stop words and punctuation, the lemmatized parts of speech, the source of
+# resolve_lemma, and the nltk version and WordNet corpus. Importing nltk.data
+# takes a second or two, so it is computed once per process.
+@functools.lru_cache(maxsize=None)
+def lemma_fingerprint():
+    config = [sorted(stop_words),
+              punctuations,
+              sorted(wordnet_pos.items()),
+              inspect.getsource(resolve_lemma),
+              wordnet_version()]
+
+    return hashlib.sha256(repr(config).encode('utf-8')).hexdigest()
+
+# Loads the persisted lemma table, discarding it if it was built with a
+# different lemma fingerprint
+def load_lemma_table(path=lemma_table_path):
+    global lemma_table
+
+    lemma_table = {}
+    if os.path.exists(path):
+        with open(path, 'rb') as file:
+            saved = pickle.load(file)
+        if saved.get('fingerprint') == lemma_fingerprint():
+            lemma_table = saved['lemmas']
+
+    return lemma_table
+
+# Saves the lemma table together with the fingerprint it was built with
+def save_lemma_table(path=lemma_table_path):
+    with open(path, 'wb') as file:
+        pickle.dump({'fingerprint': lemma_fingerprint(),
+                     'lemmas': lemma_table if lemma_table is not None else {}}, file)
+
+# Resolves a (text, part of speech) pair with WordNet and records the result
+# in the lemma table. Only called for pairs not already in the table.
+def resolve_lemma(text, pos):
+    lemma = None
+
+    if pos in wordnet_pos:
+        lemma = get_lemmatizer().lemmatize(text, wordnet_pos[pos])
+        if lemma in stop_word_set or lemma in punctuations:
+            lemma = None
+
+    lemma_table[(text, pos)] = lemma
+    return lemma
+
+# Tokenizes transcripts and saves the lemma table seen across all of them
+def build_lemma_table(texts, batch_size=50, n_process=1, path=lemma_table_path):
+    load_lemma_table(path)
+    tokenize_corpus(texts, batch_size=batch_size, n_process=n_process)
+    save_lemma_table(path)
+    return lemma_table
+
+# --------------------------------------------------------------------------- #
+# TOKENIZATION FUNCTION
+# --------------------------------------------------------------------------- #
+
+# Lemmatizes a spaCy doc and removes stop words and punctuation
+def lemmatize_doc(mytokens):
+    if lemma_table is None:
+        load_lemma_table()
+
+    # Text is already lowercased by clean_transcript, so each token is
+    # resolved with a single lookup and WordNet is only used for new pairs
     lemmas = []
     for word in mytokens:
-        if word.pos_ == 'NOUN':
-            lemmas.append(lemmatizer.lemmatize(word.text.lower().strip(), wordnet.NOUN))
-        elif word.pos_ == 'VERB':
-            lemmas.append(lemmatizer.lemmatize(word.text.lower().strip(), wordnet.VERB))
-        elif word.pos_ == 'ADV':
-            lemmas.append(lemmatizer.lemmatize(word.text.lower().strip(), wordnet.ADV))
-        elif word.pos_ == 'ADJ':
-            lemmas.append(lemmatizer.lemmatize(word.text.lower().strip(), wordnet.ADJ))
-
-    lemmas = [word for word in lemmas if word not in stop_words and word not in punctuations]
+        key = (word.text, word.pos_)
+        lemma = lemma_table.get(key, missing)
+        if lemma is missing:
+            lemma = resolve_lemma(word.text, word.pos_)
+        if lemma is not None:
+            lemmas.append(lemma)
 
     # return preprocessed list of tokens
     return lemmas
 
+def spacy_tokenizer(text):
+
+    # Lemmatize here
+    # Creating our token object, which is used to create documents with linguistic annotations.
+    # the parser and ner parts of the pipeline are disabled at load time in order to speed up parsing
+    mytokens = get_nlp()(clean_transcript(text))
+
+    return lemmatize_doc(mytokens)
+
+# --------------------------------------------------------------------------- #
+# CORPUS TOKENIZATION FUNCTION
+# --------------------------------------------------------------------------- #
+
+# Tokenizes an iterable of transcripts, yielding one list of tokens per
+# transcript in input order (identical to calling spacy_tokenizer on each
+# transcript). Cleaned texts are streamed through nlp.pipe in batches,
+# optionally split across n_process worker processes, so only a few batches
+# are held in memory at a time.
+def iter_tokenize_corpus(texts, batch_size=50, n_process=1):
+
+    # Generator so that cleaning is interleaved with parsing instead of
+    # holding every cleaned transcript in memory at once
+    cleaned = (clean_transcript(text) for text in texts)
+
+    docs = get_nlp().pipe(cleaned, batch_size=batch_size, n_process=n_process)
+
+    for doc in docs:
+        yield lemmatize_doc(doc)
+
+# Tokenizes an iterable of transcripts, returning a list with one list of
+# tokens per transcript
+def tokenize_corpus(texts, batch_size=50, n_process=1):
+    return list(iter_tokenize_corpus(texts, batch_size=batch_size, n_process=n_process))
+
 # --------------------------------------------------------------------------- #
 # NEW TRANSCRIPT FUNCTION
 # --------------------------------------------------------------------------- #
 
 # Creates new transcript from tokens
+# (vectorizer.TokenVectorizer maps token lists to a document-term matrix
+# directly, without building this string)
 def get_new_transcript(tokens):
-    transcript = ''
-    for token in tokens:
-        transcript += token.strip() + ' '
-    return transcript.strip()
+    return ' '.join(token.strip() for token in tokens).strip()
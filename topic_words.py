@@ -0,0 +1,135 @@
+# ---------------------------------------------------------------------------- #
+# IMPORT PACKAGES
+# ---------------------------------------------------------------------------- #
+
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from columnar import ArtifactWriter, get_strings, load_arrays, manifest_path, read_manifest
+from cooccurrence import topic_names
+
+# ---------------------------------------------------------------------------- #
+# TOPIC-WORD INDEX
+# ---------------------------------------------------------------------------- #
+
+topic_words_path = 'Models/topic_words'
+
+# Files the index is built from
+topic_words_sources = [manifest_path(topic_words_path), 'Models/final_lda.pkl', 'Models/final_cv.pkl']
+
+class TopicWordIndex:
+    """
+    Ranked words of every topic of an LDA model, and ranked topics of every word.
+
+    weights[t, w] is the probability of word w in topic t (the model's
+    components_, normalized per topic). word_ranks[t] lists the word ids of
+    topic t from highest to lowest weight, so the top n words of a topic are a
+    slice. topic_ranks[w] lists the topics from highest to lowest weight of word
+    w, and word_ids maps each word to its id, so looking up the topics that weight
+    a word most is a dictionary lookup and a row read.
+    """
+
+    def __init__(self, vocab, names, weights, word_ranks, topic_ranks):
+        self.vocab = np.asarray(vocab, dtype=object)
+        self.names = list(names)
+        self.weights = weights
+        self.word_ranks = word_ranks
+        self.topic_ranks = topic_ranks
+        self.word_ids = {word: word_id for word_id, word in enumerate(self.vocab.tolist())}
+
+    # Build from an LDA model's components_ and the vectorizer's vocabulary
+    @classmethod
+    def build(cls, components, vocab, names=None):
+        """
+        This function builds the index from components (K x V topic-word
+        weights) and vocab (the V words, in column order). Ties are ranked by
+        lower word or topic id.
+        """
+        components = np.asarray(components, dtype=np.float64)
+        weights = (components / components.sum(axis=1, keepdims=True)).astype(np.float32)
+        if names is None:
+            names = ['Topic ' + str(topic + 1) for topic in range(len(weights))]
+
+        word_dtype = np.min_scalar_type(weights.shape[1] - 1)
+        topic_dtype = np.min_scalar_type(weights.shape[0] - 1)
+        word_ranks = np.argsort(-weights, axis=1, kind='stable').astype(word_dtype)
+        topic_ranks = np.argsort(-weights.T, axis=1, kind='stable').astype(topic_dtype)
+
+        return cls(vocab, names, weights, word_ranks, topic_ranks)
+
+    # Build from the saved LDA model and CountVectorizer
+    @classmethod
+    def from_models(cls, lda_path='Models/final_lda.pkl', cv_path='Models/final_cv.pkl', names=topic_names):
+        with open(lda_path, 'rb') as file:
+            lda = pickle.load(file)
+        with open(cv_path, 'rb') as file:
+            cv = pickle.load(file)
+
+        # Words in column order
+        vocab = sorted(cv.vocabulary_, key=cv.vocabulary_.get)
+
+        return cls.build(lda.components_, vocab, names)
+
+    # Topic number of a topic given by number or name
+    def topic_id(self, topic):
+        return self.names.index(topic) if isinstance(topic, str) else topic
+
+    # Top n words of a topic, with their weights
+    def top_words(self, topic, n):
+        word_ids = self.word_ranks[self.topic_id(topic), :n]
+        return self.vocab[word_ids].tolist(), self.weights[self.topic_id(topic), word_ids].tolist()
+
+    # Top n words of every topic as a dataframe (one row per topic, columns 1 to n)
+    def top_words_frame(self, n):
+        return pd.DataFrame(self.vocab[self.word_ranks[:, :n]], index=self.names, columns=range(1, n + 1))
+
+    # Topics that weight a word most, with the word's weight in each
+    def word_topics(self, word, n=None):
+        """
+        This function returns the names of the n topics (all topics if n is None)
+        in which word has the highest probability, highest first, and those
+        probabilities. It returns two empty lists if word is not in the vocabulary.
+        """
+        word_id = self.word_ids.get(word)
+        if word_id is None:
+            return [], []
+
+        topics = self.topic_ranks[word_id, :n]
+        return [self.names[topic] for topic in topics.tolist()], self.weights[topics, word_id].tolist()
+
+    # Save as a columnar artifact (see columnar.py)
+    def save(self, directory=topic_words_path):
+        writer = ArtifactWriter(directory, 'topic_words', names=self.names)
+        writer.strings('vocab', self.vocab)
+        writer.array('weights', self.weights)
+        writer.array('word_ranks', self.word_ranks)
+        writer.array('topic_ranks', self.topic_ranks)
+        writer.close()
+
+    # Load a saved index, memory-mapping the weight and rank arrays
+    @classmethod
+    def load(cls, directory=topic_words_path):
+        manifest = read_manifest(directory)
+        if manifest['kind'] != 'topic_words':
+            raise ValueError(f'{directory} is not a topic-word index')
+
+        arrays = load_arrays(directory, manifest)
+        return cls(get_strings(arrays, 'vocab').tolist(), manifest['names'], arrays['weights'],
+                   arrays['word_ranks'], arrays['topic_ranks'])
+
+# Load the topic-word index, building it from the saved models (without saving)
+# if it has not been built
+def get_topic_word_index(path=topic_words_path):
+    try:
+        return TopicWordIndex.load(path)
+    except FileNotFoundError:
+        return TopicWordIndex.from_models()
+
+# ---------------------------------------------------------------------------- #
+# BUILD TOPIC-WORD INDEX
+# ---------------------------------------------------------------------------- #
+
+if __name__ == '__main__':
+    TopicWordIndex.from_models().save()
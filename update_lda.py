@@ -0,0 +1,254 @@
+# ---------------------------------------------------------------------------- #
+# IMPORT PACKAGES
+# ---------------------------------------------------------------------------- #
+
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+from ann_index import TopicANNIndex, ann_index_path
+from columnar import columnar_path, file_checksum, load_columnar_or_pickle, manifest_path, write_artifact
+from cooccurrence import topic_names
+from dtm_builder import get_rank_names, top_topic_ranks
+from inference import cv_path, lda_path
+from recommender import neighbor_sim_path, neighbor_diff_path, paired_jensen_shannon, patch_neighbor_table
+from tokenizer import tokenize_corpus
+from topic_words import TopicWordIndex, topic_words_path
+from vectorizer import TokenVectorizer
+
+# ---------------------------------------------------------------------------- #
+# INCREMENTAL LDA UPDATES
+# ---------------------------------------------------------------------------- #
+
+dtm_path = 'Models/final_lda_dtm.pkl'
+talk_path = 'Data/final_raw_data.pkl'
+
+# Topic-word distributions of the last full training run, compared against to
+# measure drift, with the checksum of the model pickle as ingest_talks last saw
+# it (a different checksum means the model was retrained since)
+reference_path = 'Models/lda_reference.npz'
+
+# History of incremental updates and their drift metrics
+update_log_path = 'Models/lda_updates.json'
+
+# Pickle an object, replacing the file only once it is completely written
+def save_pickle(obj, path):
+    with open(path + '.tmp', 'wb') as file:
+        pickle.dump(obj, file)
+    os.replace(path + '.tmp', path)
+
+# Save the reference topic-word distributions and the checksum of their model
+def save_reference(components, model_checksum, path=reference_path):
+    with open(path + '.tmp', 'wb') as file:
+        np.savez(file, components=components, model_sha256=np.array(model_checksum))
+    os.replace(path + '.tmp', path)
+
+# Reference topic-word distributions for drift, reset after a full retrain
+def get_reference(lda, model_path=lda_path, path=reference_path):
+    """
+    This function returns the topic-word distributions of the last full training
+    run. The saved reference is used if the model pickle is still the one that
+    ingest_talks last saved (or the reference was taken from) and has the same
+    topics and vocabulary size. Otherwise the model was retrained since, and its
+    current distributions become the new reference.
+    """
+    model_checksum = file_checksum(model_path)
+    if os.path.exists(path):
+        with np.load(path) as saved:
+            if str(saved['model_sha256']) == model_checksum and saved['components'].shape == lda.components_.shape:
+                return saved['components']
+        print(f'{model_path} was retrained since the last update; measuring drift from it')
+
+    components = lda.components_ / lda.components_.sum(axis=1, keepdims=True)
+    save_reference(components, model_checksum, path)
+    return components
+
+# Save a dataframe to its pickle, and to its columnar version if it has one
+def save_frame(frame, pickle_path):
+    save_pickle(frame, pickle_path)
+
+    if os.path.exists(manifest_path(columnar_path(pickle_path))):
+        write_artifact(frame, columnar_path(pickle_path), source_path=pickle_path)
+
+# New rows with the columns and column types of a dataframe they are appended to
+def match_dtypes(new_rows, frame):
+    """
+    This function returns the columns of frame from new_rows, with numeric and
+    date columns parsed to frame's types (values read from CSV are all strings,
+    which would otherwise turn e.g. duration into a column of strings).
+    Unparseable values become missing.
+    """
+    new_rows = new_rows[frame.columns].copy()
+
+    for name, dtype in frame.dtypes.items():
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            # Parsed one by one, since new talks may not share one date format
+            tz = getattr(dtype, 'tz', None)
+            values = pd.to_datetime([pd.to_datetime(value, errors='coerce', utc=tz is not None)
+                                     for value in new_rows[name]], utc=tz is not None)
+            new_rows[name] = values if tz is None else values.tz_convert(tz)
+        elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            values = pd.to_numeric(new_rows[name], errors='coerce')
+            new_rows[name] = values.astype(dtype) if values.notnull().all() else values
+
+    return new_rows
+
+# Index labels for rows appended to a dataframe, continuing its numbering
+def continue_index(index, n_new):
+    new_positions = range(len(index), len(index) + n_new)
+    if len(index) and isinstance(index[0], str) and index[0].startswith('Doc'):
+        return pd.Index(['Doc' + str(position) for position in new_positions])
+    return pd.RangeIndex(new_positions.start, new_positions.stop)
+
+# Share of tokens that do not map to the model vocabulary
+def oov_rate(token_docs, dtm):
+    n_tokens = sum(len(tokens) for tokens in token_docs)
+    return max(0.0, 1 - dtm.sum() / n_tokens) if n_tokens else 0.0
+
+# Drift of the model since its last full training run
+def drift_report(reference, components, new_oov_rate, max_topic_shift=0.1, max_oov_rate=0.3, names=None):
+    """
+    This function measures how far incremental updates have moved the model:
+    topic_shift is, per topic, the Jensen-Shannon distance between its word
+    distribution at the last full training run (reference) and now (components),
+    and oov_rate is the share of the new talks' tokens that the model's fixed
+    vocabulary cannot represent. A full retrain (which refits the vocabulary and
+    re-scores every talk) is recommended once either passes its threshold.
+    Topics are reported by names (default Topic 1, Topic 2, ...).
+    """
+    shift = paired_jensen_shannon(np.asarray(reference, dtype=float), np.asarray(components, dtype=float))
+    if names is None:
+        names = ['Topic ' + str(topic + 1) for topic in range(len(shift))]
+
+    reasons = []
+    if shift.max() > max_topic_shift:
+        reasons.append(f'topic {names[int(shift.argmax())]} shifted by {shift.max():.3f} (> {max_topic_shift})')
+    if new_oov_rate > max_oov_rate:
+        reasons.append(f'{new_oov_rate:.1%} of new tokens are out of vocabulary (> {max_oov_rate:.0%})')
+
+    return {'topic_shift': shift.tolist(), 'max_topic_shift': float(shift.max()),
+            'oov_rate': float(new_oov_rate), 'retrain': bool(reasons), 'reasons': reasons}
+
+# Add new talks to the LDA model, document-topic matrix and recommendation indexes
+def ingest_talks(new_talks, text_field='transcript', batch_size=50, n_process=1,
+                 max_topic_shift=0.1, max_oov_rate=0.3):
+    """
+    This function adds new_talks (a dataframe with the same columns as the talk
+    metadata, including the transcript in text_field) without retraining:
+
+    1. the transcripts are tokenized and vectorized over the saved vocabulary,
+    2. the saved LDA model is updated with one online partial_fit step on them,
+    3. their topic distributions and dominant/secondary/tertiary topics are
+       appended to the document-topic matrix (and the talks to the metadata),
+    4. the neighbor table, approximate nearest-neighbor index and topic-word
+       index are patched if they have been built,
+    5. drift since the last full training run (see get_reference) is logged.
+
+    Existing rows of the document-topic matrix are not re-scored; the drift
+    report says when the model has moved enough that a full retrain is warranted.
+    It returns the drift report.
+    """
+    start = time.perf_counter()
+    texts = new_talks[text_field].tolist()
+
+    with open(cv_path, 'rb') as file:
+        cv = pickle.load(file)
+    with open(lda_path, 'rb') as file:
+        lda = pickle.load(file)
+
+    # Vectorize new transcripts over the saved vocabulary
+    token_docs = tokenize_corpus(texts, batch_size=batch_size, n_process=n_process)
+    dtm = TokenVectorizer.from_count_vectorizer(cv).transform(token_docs)
+
+    # Topic-word distributions of the last full training run
+    reference = get_reference(lda)
+
+    lda_dtm = load_columnar_or_pickle(dtm_path)
+    n_old = len(lda_dtm)
+    n_topics = lda.n_components
+    names = topic_names if n_topics == len(topic_names) else ['Topic ' + str(topic + 1) for topic in range(n_topics)]
+
+    # Online update, weighting the new talks as part of a corpus of n_old + new talks
+    lda.total_samples = n_old + len(texts)
+    lda.partial_fit(dtm)
+
+    # Topic rows for the new talks
+    doc_topic = lda.transform(dtm)
+    new_rows = pd.DataFrame(doc_topic, columns=lda_dtm.columns[:n_topics],
+                            index=continue_index(lda_dtm.index, len(texts)))
+    rank_names = get_rank_names(3)
+    ranks = top_topic_ranks(doc_topic, len(rank_names))
+    for rank, name in enumerate(rank_names):
+        new_rows[name] = ranks[:, rank].astype(lda_dtm[name].dtype)
+
+    lda_dtm = pd.concat([lda_dtm, new_rows])
+
+    # Drift since last full training run, measured before anything is saved
+    report = drift_report(reference, lda.components_, oov_rate(token_docs, dtm),
+                          max_topic_shift=max_topic_shift, max_oov_rate=max_oov_rate, names=names)
+
+    # The model is saved before the rows it inferred, so a crash in between never
+    # leaves rows in the matrix from a model that was not saved
+    save_pickle(lda, lda_path)
+    save_reference(reference, file_checksum(lda_path))
+    save_frame(lda_dtm, dtm_path)
+
+    # Talk metadata stays aligned with the document-topic matrix by position
+    if os.path.exists(talk_path) or os.path.exists(manifest_path(columnar_path(talk_path))):
+        talk_df = load_columnar_or_pickle(talk_path)
+        save_frame(pd.concat([talk_df, match_dtypes(new_talks, talk_df)], ignore_index=True), talk_path)
+
+    # Recommendation indexes
+    if os.path.exists(neighbor_sim_path) and os.path.exists(neighbor_diff_path):
+        patch_neighbor_table(lda_dtm.iloc[:, :n_topics], n_old)
+    if os.path.exists(ann_index_path):
+        ann_index = TopicANNIndex.load(ann_index_path)
+        if len(ann_index.list_ids) == n_old:
+            ann_index.add(doc_topic)
+            ann_index.save(ann_index_path)
+        else:
+            print(f'{ann_index_path} indexes {len(ann_index.list_ids)} talks, not {n_old}; rebuild it with ann_index.py')
+    if os.path.exists(manifest_path(topic_words_path)):
+        TopicWordIndex.build(lda.components_, sorted(cv.vocabulary_, key=cv.vocabulary_.get), names).save()
+
+    updates = []
+    if os.path.exists(update_log_path):
+        with open(update_log_path) as file:
+            updates = json.load(file)
+    updates.append({'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'n_new': len(texts), 'n_total': len(lda_dtm), **report})
+    with open(update_log_path, 'w') as file:
+        json.dump(updates, file, indent=2)
+
+    print(f'Added {len(texts)} talks ({len(lda_dtm)} total) in {time.perf_counter() - start:.1f}s; '
+          f'max topic shift {report["max_topic_shift"]:.3f}, OOV rate {report["oov_rate"]:.1%}')
+    if report['retrain']:
+        print('Full retrain recommended: ' + '; '.join(report['reasons']))
+
+    return report
+
+# ---------------------------------------------------------------------------- #
+# INGEST NEW TALKS
+# ---------------------------------------------------------------------------- #
+
+if __name__ == '__main__':
+    import argparse
+
+    from tokenize_stream import read_records
+
+    parser = argparse.ArgumentParser(description='Add new talks to the LDA model, document-topic matrix '
+                                                 'and recommendation indexes without retraining.')
+    parser.add_argument('input', help='CSV or JSONL file of new talks, with the columns of the talk metadata')
+    parser.add_argument('--text-field', default='transcript', help='field holding the transcript text')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default=None,
+                        help='input format (default: from file extension)')
+    parser.add_argument('--max-topic-shift', type=float, default=0.1)
+    parser.add_argument('--max-oov-rate', type=float, default=0.3)
+    args = parser.parse_args()
+
+    new_talks = pd.DataFrame(list(read_records(args.input, args.format)))
+    ingest_talks(new_talks, text_field=args.text_field,
+                 max_topic_shift=args.max_topic_shift, max_oov_rate=args.max_oov_rate)
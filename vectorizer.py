@@ -0,0 +1,101 @@
+# ---------------------------------------------------------------------------- #
+# IMPORT PACKAGES
+# ---------------------------------------------------------------------------- #
+
+import threading
+from itertools import chain
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# ---------------------------------------------------------------------------- #
+# TOKEN LIST VECTORIZER
+# ---------------------------------------------------------------------------- #
+
+class TokenVectorizer:
+    """
+    Maps lists of tokens (as returned by spacy_tokenizer) straight to a document-term
+    count matrix over the vocabulary of a fitted CountVectorizer, without joining the
+    tokens into a transcript with get_new_transcript for the CountVectorizer to split
+    apart again.
+
+    The CountVectorizer's analyzer is run once per distinct token, and the resulting
+    column ids are stored in an array indexed by token slot. transform then looks up
+    each token's slot, gathers the columns for the whole corpus with one array index,
+    and builds the CSR matrix in one pass. The result equals
+    cv.transform([get_new_transcript(tokens) for tokens in token_docs]).
+    """
+
+    def __init__(self, vocabulary, analyzer, dtype=np.int64):
+        self.vocabulary = vocabulary # term -> column id
+        self.analyzer = analyzer     # CountVectorizer analyzer (text -> terms)
+        self.dtype = dtype
+        self.n_features = len(vocabulary)
+
+        self.slot_of = {}            # token -> slot
+        self.slot_columns = []       # slot -> column id, or -1 if not in vocabulary
+        self.multi_columns = {}      # slot -> column ids, for tokens the analyzer splits
+        self.lock = threading.Lock() # new tokens are added to the slot table in transform
+
+    # Build from a fitted CountVectorizer (e.g. Models/final_cv.pkl)
+    @classmethod
+    def from_count_vectorizer(cls, cv):
+        return cls(cv.vocabulary_, cv.build_analyzer(), dtype=cv.dtype)
+
+    # Slot for token, analyzing it the first time it is seen
+    def _add(self, token):
+        slot = len(self.slot_columns)
+        self.slot_of[token] = slot
+
+        # The analyzer's token pattern never matches across the spaces that
+        # get_new_transcript puts between tokens, so each token can be analyzed alone
+        columns = [self.vocabulary[term] for term in self.analyzer(token.strip())
+                   if term in self.vocabulary]
+
+        if len(columns) == 1:
+            self.slot_columns.append(columns[0])
+        else:
+            self.slot_columns.append(-1)
+            if columns:
+                self.multi_columns[slot] = columns
+
+        return slot
+
+    def _slot(self, token):
+        slot = self.slot_of.get(token)
+        return slot if slot is not None else self._add(token)
+
+    # Get document-term count matrix for lists of tokens
+    def transform(self, token_docs):
+        token_docs = token_docs if isinstance(token_docs, list) else list(token_docs)
+
+        doc_lengths = np.fromiter((len(tokens) for tokens in token_docs), dtype=np.int64,
+                                  count=len(token_docs))
+
+        with self.lock:
+            slots = np.fromiter((self._slot(token) for token in chain.from_iterable(token_docs)),
+                                dtype=np.int64, count=int(doc_lengths.sum()))
+            slot_columns = np.asarray(self.slot_columns, dtype=np.int64)
+
+        rows = np.repeat(np.arange(len(token_docs)), doc_lengths)
+        columns = slot_columns[slots]
+
+        # Tokens that map to exactly one column
+        found = columns >= 0
+        rows_found, columns_found = rows[found], columns[found]
+
+        # Rare tokens that the analyzer splits into several terms
+        if self.multi_columns:
+            extra = [(row, column) for row, slot in zip(rows[~found], slots[~found])
+                     for column in self.multi_columns.get(slot, ())]
+            if extra:
+                extra_rows, extra_columns = np.array(extra, dtype=np.int64).T
+                rows_found = np.concatenate([rows_found, extra_rows])
+                columns_found = np.concatenate([columns_found, extra_columns])
+
+        # Duplicate (row, column) entries are summed into counts
+        dtm = csr_matrix((np.ones(len(rows_found), dtype=self.dtype), (rows_found, columns_found)),
+                         shape=(len(token_docs), self.n_features))
+        dtm.sort_indices()
+
+        return dtm
@@ -0,0 +1,206 @@
+# ---------------------------------------------------------------------------- #
+# IMPORT PACKAGES
+# ---------------------------------------------------------------------------- #
+
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from columnar import ArtifactWriter, get_strings, load_arrays, manifest_path, read_manifest
+
+# ---------------------------------------------------------------------------- #
+# YEAR x TOKEN COUNT MATRIX
+# ---------------------------------------------------------------------------- #
+
+year_tokens_path = 'Data/year_tokens'
+
+# Files the matrix is built from
+year_tokens_sources = [manifest_path(year_tokens_path), 'Data/year_tok.pkl']
+
+class YearTokens:
+    """
+    Sparse year x token count matrix for the 'Talks By Year' page, in CSR form:
+    row r holds the counts of the tokens used in talks recorded in years[r], with
+    token ids indices[indptr[r]:indptr[r + 1]] and counts
+    counts[indptr[r]:indptr[r + 1]]. Years are sorted, so a range of years is a
+    contiguous block of rows.
+
+    Each row is stored in rank order (most frequent token first), so the top
+    tokens of a single year are a slice. Ranges of years and differences between
+    two years are summed into a dense vocabulary vector and ranked with
+    argpartition.
+    """
+
+    def __init__(self, vocab, years, indptr, indices, counts):
+        self.vocab = np.asarray(vocab, dtype=object)
+        self.years = np.asarray(years, dtype=np.int64)
+        self.indptr = indptr
+        self.indices = indices
+        self.counts = counts
+        self.rows = {year: row for row, year in enumerate(self.years.tolist())}
+
+    # Build from rows of (year, token ids, counts), ranking each row
+    @classmethod
+    def from_rows(cls, vocab, rows):
+        rows = sorted(rows, key=lambda row: row[0])
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        indices, counts = [], []
+
+        for row, (_, token_ids, token_counts) in enumerate(rows):
+            # Stable, so tied tokens keep their order in the row
+            order = np.argsort(-token_counts, kind='stable')
+            indices.append(token_ids[order])
+            counts.append(token_counts[order])
+            indptr[row + 1] = indptr[row] + len(order)
+
+        return cls(vocab, [row[0] for row in rows], indptr,
+                   np.concatenate(indices).astype(np.uint32), np.concatenate(counts).astype(np.int64))
+
+    # Build from the per-year token frequencies ({year: {'lemma_freq': {token: count}}})
+    @classmethod
+    def from_year_dict(cls, tok_year_corpus):
+        """
+        This function builds the matrix from the dictionary saved in
+        Data/year_tok.pkl. Tied tokens keep their order in each year's
+        lemma_freq, so rankings match sorting that dictionary by count.
+        """
+        index = {}
+        rows = []
+        for year in sorted(tok_year_corpus):
+            lemma_freq = tok_year_corpus[year]['lemma_freq']
+            token_ids = np.fromiter((index.setdefault(token, len(index)) for token in lemma_freq),
+                                    dtype=np.int64, count=len(lemma_freq))
+            rows.append((year, token_ids, np.fromiter(lemma_freq.values(), dtype=np.int64, count=len(lemma_freq))))
+
+        return cls.from_rows(list(index), rows)
+
+    # Build from a TokenCorpus and the year each document was recorded in
+    @classmethod
+    def from_token_corpus(cls, token_corpus, doc_years):
+        """
+        This function builds the matrix from a TokenCorpus (see token_corpus.py)
+        and an array of the year each of its documents was recorded in. Documents
+        with a missing year are left out.
+        """
+        doc_years = pd.Series(doc_years).to_numpy(dtype=float)
+        token_years = np.repeat(doc_years, np.diff(token_corpus.offsets))
+        known = ~np.isnan(token_years)
+
+        years, year_rows = np.unique(token_years[known].astype(np.int64), return_inverse=True)
+        n_vocab = len(token_corpus.vocab)
+        matrix = np.bincount(year_rows * n_vocab + token_corpus.ids[known],
+                             minlength=len(years) * n_vocab).reshape(len(years), n_vocab)
+
+        rows = []
+        for year, year_counts in zip(years.tolist(), matrix):
+            token_ids = np.flatnonzero(year_counts)
+            rows.append((year, token_ids, year_counts[token_ids]))
+
+        return cls.from_rows(token_corpus.vocab, rows)
+
+    # Number of distinct tokens used in a year
+    def n_tokens(self, year):
+        row = self.rows[year]
+        return int(self.indptr[row + 1] - self.indptr[row])
+
+    # Dense vector of token counts over a range of years (inclusive)
+    def range_counts(self, start_year, end_year):
+        rows = np.searchsorted(self.years, [start_year, end_year + 1])
+        start, end = self.indptr[rows[0]], self.indptr[rows[1]]
+        return np.bincount(self.indices[start:end], weights=self.counts[start:end],
+                           minlength=len(self.vocab))
+
+    # Tokens ranked nmin to nmax in a dense vector of scores
+    def top_scores(self, scores, token_ids, nmin, nmax):
+        """
+        This function returns the tokens ranked nmin to nmax (1-indexed, nmax
+        exclusive, as on the EDA sliders) by descending score among token_ids,
+        and their scores. Only the top nmax tokens are sorted; ties are broken
+        by token id.
+        """
+        nmax = min(nmax, len(token_ids) + 1)
+        if nmax <= nmin:
+            return [], []
+
+        candidate_scores = scores[token_ids]
+        if nmax - 1 < len(token_ids):
+            top = np.argpartition(-candidate_scores, nmax - 2)[:nmax - 1]
+        else:
+            top = np.arange(len(token_ids))
+        top = token_ids[top[np.lexsort((top, -candidate_scores[top]))]][nmin - 1:]
+        return self.vocab[top].tolist(), scores[top].tolist()
+
+    # Tokens ranked nmin to nmax in a single year
+    def top_year(self, year, nmin, nmax):
+        start = self.indptr[self.rows[year]]
+        end = self.indptr[self.rows[year] + 1]
+        ranked = slice(min(start + nmin - 1, end), min(start + nmax - 1, end))
+        return self.vocab[self.indices[ranked]].tolist(), self.counts[ranked].tolist()
+
+    # Tokens ranked nmin to nmax over a range of years (inclusive)
+    def top_range(self, start_year, end_year, nmin, nmax):
+        counts = self.range_counts(start_year, end_year)
+        tokens, counts = self.top_scores(counts, np.flatnonzero(counts), nmin, nmax)
+        return tokens, [int(count) for count in counts]
+
+    # Tokens ranked nmin to nmax by how much more often they are used in year_a than year_b
+    def top_diff(self, year_a, year_b, nmin, nmax, normalize=True):
+        """
+        This function ranks tokens by count in year_a minus count in year_b. If
+        normalize, counts are first divided by the total number of tokens in each
+        year, so years with more talks do not dominate; scores are then
+        differences in frequency per 1,000 tokens. Only tokens used more in
+        year_a (positive scores) are ranked, so fewer tokens than the slider
+        range may be returned.
+        """
+        counts_a = self.range_counts(year_a, year_a)
+        counts_b = self.range_counts(year_b, year_b)
+        if normalize:
+            counts_a = 1000 * counts_a / max(counts_a.sum(), 1)
+            counts_b = 1000 * counts_b / max(counts_b.sum(), 1)
+
+        scores = counts_a - counts_b
+        return self.top_scores(scores, np.flatnonzero(scores > 0), nmin, nmax)
+
+    # Save as a columnar artifact (see columnar.py)
+    def save(self, directory=year_tokens_path):
+        writer = ArtifactWriter(directory, 'year_tokens')
+        writer.strings('vocab', self.vocab)
+        writer.array('years', self.years)
+        writer.array('indptr', self.indptr)
+        writer.array('indices', self.indices)
+        writer.array('counts', self.counts)
+        writer.close()
+
+    # Load a saved matrix, memory-mapping the count arrays
+    @classmethod
+    def load(cls, directory=year_tokens_path):
+        manifest = read_manifest(directory)
+        if manifest['kind'] != 'year_tokens':
+            raise ValueError(f'{directory} is not a year x token matrix')
+
+        arrays = load_arrays(directory, manifest)
+        return cls(get_strings(arrays, 'vocab').tolist(), arrays['years'], arrays['indptr'],
+                   arrays['indices'], arrays['counts'])
+
+# Load the year x token matrix, building it from Data/year_tok.pkl (without
+# saving) if it has not been built
+def get_year_tokens(path=year_tokens_path):
+    try:
+        return YearTokens.load(path)
+    except FileNotFoundError:
+        with open('Data/year_tok.pkl', 'rb') as file:
+            return YearTokens.from_year_dict(pickle.load(file))
+
+# ---------------------------------------------------------------------------- #
+# BUILD YEAR x TOKEN COUNT MATRIX
+# ---------------------------------------------------------------------------- #
+
+if __name__ == '__main__':
+
+    # Load in tokens by year
+    with open('Data/year_tok.pkl', 'rb') as file:
+        tok_year_corpus = pickle.load(file)
+
+    YearTokens.from_year_dict(tok_year_corpus).save()